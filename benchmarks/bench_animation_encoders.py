@@ -0,0 +1,58 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Benchmark of the AnimationEncoder formats against the GIF path, encode time and file size for
+# synthetic frames that drift like a tile stack.  MP4 is skipped without imageio-ffmpeg:
+#   python -m benchmarks.bench_animation_encoders [num_frames] [size_px]
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+
+from spotlite.encode import AnimationEncoder, ANIMATION_EXTENSIONS
+
+
+def make_frames(num_frames, size_px, seed=0):
+    """Smooth terrain with sensor noise, shifted a little on every frame."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size_px, 0:size_px] / size_px
+    terrain = np.stack([np.sin(6 * x) * np.cos(4 * y), np.cos(5 * x + y), np.sin(3 * y - 2 * x)], axis=-1)
+    base = ((terrain + 1) * 100).astype(np.uint8)
+    for index in range(num_frames):
+        frame = np.roll(base, shift=index * 3, axis=1)
+        yield np.clip(frame + rng.integers(0, 12, frame.shape), 0, 255).astype(np.uint8)
+
+
+def main(num_frames, size_px):
+    output_dir = tempfile.mkdtemp()
+    try:
+        results = []
+        for format, extension in ANIMATION_EXTENSIONS.items():
+            output_filename = os.path.join(output_dir, f"animation{extension}")
+            try:
+                with AnimationEncoder(output_filename, format, period_sec=0.5) as encoder:
+                    for frame in make_frames(num_frames, size_px):
+                        encoder.append(frame)
+            except ImportError as e:
+                print(f"Skipping {format}: {e}")
+                continue
+            results.append(encoder.last_encode_stats)
+
+        gif = next((stats for stats in results if stats['format'] == 'gif'), None)
+        print(f"{'format':>7} {'frames':>7} {'encode_s':>9} {'size_kb':>9} {'vs_gif_time':>12} {'vs_gif_size':>12}")
+        for stats in results:
+            print(f"{stats['format']:>7} {stats['frames']:>7} {stats['seconds']:>9.2f} {stats['bytes'] / 1024:>9.0f} "
+                  f"{stats['seconds'] / gif['seconds']:>11.2f}x {stats['bytes'] / gif['bytes']:>11.2f}x")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [20, 1024][len(args):]))
@@ -0,0 +1,119 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Benchmark for TileManager._create_animation_from_files against the previous frame loop, which
+# reprojected every mosaic into a float64 array, wrote and reread it, then resized it again with PIL.
+# Uses synthetic mosaics with shifted extents so it runs offline:
+#   python -m benchmarks.bench_animation_frames [num_frames] [size_px]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.warp import reproject, transform_bounds
+from shapely.geometry import box
+import imageio
+from PIL import Image, ImageDraw, ImageFont
+
+from spotlite.tile import TileManager
+
+
+def make_mosaics(num_frames, size_px, seed=0):
+    """Writes images/CaptureDate_* mosaics in the current directory, returns their names and footprints."""
+    rng = np.random.default_rng(seed)
+    os.makedirs("images")
+    crs = "EPSG:32721"
+    start = datetime(2023, 1, 1)
+    fnames, footprints = [], []
+    for index in range(num_frames):
+        left, top = 500000 + rng.integers(0, 50), 6000000 - rng.integers(0, 50)
+        transform = from_origin(left, top, 1.0, 1.0)
+        fname = os.path.join("images", f"CaptureDate_{(start + timedelta(days=index)).strftime('%Y%m%dT%H%M%S')}_Mosaic.tiff")
+        with rasterio.open(fname, "w", driver="GTiff", height=size_px, width=size_px, count=3, dtype="uint8",
+                           crs=crs, transform=transform) as dst:
+            dst.write(rng.integers(0, 255, (3, size_px, size_px), dtype=np.uint8))
+        fnames.append(fname)
+        footprints.append(box(*transform_bounds(crs, "EPSG:4326", left, top - size_px, left + size_px, top)))
+    return fnames, footprints
+
+
+def legacy_animation(tile_manager, image_filenames, output_filename, bbox_aoi, font):
+    """The write/reproject/reread loop that the frame pipeline replaced."""
+    def max_dimensions_and_bounds(fnames):
+        max_width, max_height, largest = 0, 0, None
+        for fname in fnames:
+            with rasterio.open(fname) as src:
+                max_width, max_height = max(max_width, src.width), max(max_height, src.height)
+                b = src.bounds
+                largest = b if largest is None else (min(largest[0], b[0]), min(largest[1], b[1]),
+                                                     max(largest[2], b[2]), max(largest[3], b[3]))
+        return max_width, max_height, largest
+
+    image_filenames = sorted(image_filenames, key=tile_manager._extract_date)
+    max_width, max_height, largest_bounds = max_dimensions_and_bounds(image_filenames)
+    resized = []
+    for fname in image_filenames:
+        with rasterio.open(fname) as src:
+            out_transform = rasterio.transform.from_bounds(*largest_bounds, max_width, max_height)
+            out_meta = src.meta.copy()
+            out_meta.update({"height": max_height, "width": max_width, "transform": out_transform})
+            dest_data = np.zeros((src.count, max_height, max_width))
+            reproject(source=rasterio.band(src, range(1, src.count + 1)), destination=dest_data,
+                      src_transform=src.transform, src_crs=src.crs, dst_transform=out_transform,
+                      dst_crs=src.crs, resampling=Resampling.cubic)
+            new_fname = fname.replace(".tiff", "_resized.tiff")
+            with rasterio.open(new_fname, 'w', **out_meta) as dest:
+                dest.write(dest_data)
+            resized.append(new_fname)
+
+    max_width, max_height, _ = max_dimensions_and_bounds(resized)
+    writer = imageio.get_writer(output_filename, duration=2000, macro_block_size=1, loop=0)
+    for fname in resized:
+        image = Image.open(fname).resize((max_width, max_height), Image.LANCZOS)
+        canvas = Image.new('RGBA', (max_width, max_height), 'black')
+        canvas.paste(image.convert("RGBA"), (0, 0))
+        draw = ImageDraw.Draw(canvas)
+        draw.text((10, 10), tile_manager._extract_date(fname).strftime('%Y-%m-%dT%H%M%S'), fill="yellow", font=font)
+        writer.append_data(np.array(canvas))
+    writer.close()
+
+
+def timed(func, *args):
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    func(*args)
+    return time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+
+def main(num_frames, size_px):
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(work_dir)  # _extract_date expects images/<name> paths.
+    try:
+        fnames, footprints = make_mosaics(num_frames, size_px)
+        aoi = box(*footprints[0].bounds)
+        font = ImageFont.load_default()
+        tile_manager = TileManager()
+
+        old_wall, old_cpu = timed(legacy_animation, tile_manager, list(fnames), "legacy.gif", aoi, font)
+        new_wall, new_cpu = timed(tile_manager._create_animation_from_files, list(fnames), "pipeline.gif", 2, aoi, font, footprints)
+
+        print(f"{'frames':>7} {'size_px':>8} {'legacy_s':>9} {'legacy_cpu':>11} {'pipeline_s':>11} {'pipeline_cpu':>13} {'cpu_ratio':>10}")
+        print(f"{num_frames:>7} {size_px:>8} {old_wall:>9.2f} {old_cpu:>11.2f} {new_wall:>11.2f} {new_cpu:>13.2f} {new_cpu / old_cpu:>10.2f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [10, 2000][len(args):]))
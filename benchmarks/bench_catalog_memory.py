@@ -0,0 +1,48 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Memory benchmark for the compact catalog against the regular search result GeoDataFrame.
+# Uses synthetic STAC items so it runs offline:
+#   python -m benchmarks.bench_catalog_memory [num_items ...]
+
+import sys
+import time
+from pystac import ItemCollection
+
+from spotlite.search import Searcher
+from spotlite.catalog import compact_catalog, tile_url
+from benchmarks.stub_stac_server import make_items
+
+
+def frame_size_mb(gdf):
+    # deep=True counts the Python strings and objects held by the columns.  Geometries are counted as
+    # pointers only, both representations share the same shapely 2 geometry array.
+    return gdf.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def main(sizes):
+    searcher = Searcher()
+    for num_items in sizes:
+        items = ItemCollection.from_dict({"type": "FeatureCollection", "features": make_items(num_items)})
+        tiles_gdf = searcher._setup_GDF(items)
+
+        start = time.perf_counter()
+        compact_gdf = compact_catalog(tiles_gdf)
+        compact_sec = time.perf_counter() - start
+
+        for role in ("preview", "thumbnail", "analytic"):
+            assert [tile_url(tile, role) for _, tile in compact_gdf.head(100).iterrows()] == \
+                   list(tiles_gdf[f'{role}_url'].head(100))
+
+        regular_mb = frame_size_mb(tiles_gdf)
+        compact_mb = frame_size_mb(compact_gdf)
+        print(f"items: {num_items:>7}  regular: {regular_mb:8.1f} MB  compact: {compact_mb:8.1f} MB  "
+              f"({regular_mb / compact_mb:.1f}x smaller, compacted in {compact_sec:.2f}s)")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,73 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Benchmark for TileDownloader against sequential requests.get downloads, the previous
+# download_tiles behaviour.  Runs against a local file server with simulated latency, then
+# checks resume (every first response is cut short) and the skipping of complete files:
+#   python -m benchmarks.bench_download [num_files] [size_kb] [latency_sec]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import requests
+
+from spotlite.download import TileDownloader
+from benchmarks.stub_file_server import StubFileServer, make_files
+
+
+def sequential_download(jobs):
+    for url, path in jobs:
+        with requests.get(url, stream=True) as r:
+            r.raise_for_status()
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(r.raw, f)
+
+
+def main(num_files, size_kb, latency_sec):
+    files = make_files(num_files, size_kb * 1024)
+    output_dir = tempfile.mkdtemp()
+    try:
+        with StubFileServer(files, latency_sec=latency_sec) as server:
+            jobs = [(server.file_url(name), os.path.join(output_dir, "sequential", name)) for name in files]
+            os.makedirs(os.path.join(output_dir, "sequential"))
+            start = time.perf_counter()
+            sequential_download(jobs)
+            sequential_sec = time.perf_counter() - start
+
+            downloader = TileDownloader(max_workers=8)
+            jobs = [(server.file_url(name), os.path.join(output_dir, "parallel", name)) for name in files]
+            start = time.perf_counter()
+            downloader.download(jobs)
+            parallel_sec = time.perf_counter() - start
+            assert all(open(path, 'rb').read() == files[os.path.basename(path)] for _, path in jobs)
+
+            # A second run only checks the files.
+            downloader.download(jobs)
+            assert downloader.last_download_stats['skipped'] == num_files
+
+        with StubFileServer(files, drop_after_bytes=size_kb * 512) as server:
+            downloader = TileDownloader(max_workers=8)
+            jobs = [(server.file_url(name), os.path.join(output_dir, "resumed", name)) for name in files]
+            downloader.download(jobs)
+            assert all(open(path, 'rb').read() == files[os.path.basename(path)] for _, path in jobs)
+            resumed_overhead = server.bytes_sent / (num_files * size_kb * 1024) - 1
+    finally:
+        shutil.rmtree(output_dir)
+
+    print()
+    print(f"files: {num_files} x {size_kb} KB, latency: {latency_sec}s per request")
+    print(f"sequential requests.get: {sequential_sec:.2f}s")
+    print(f"TileDownloader:          {parallel_sec:.2f}s ({sequential_sec / parallel_sec:.1f}x)")
+    print(f"resume after dropped connections re-sent {resumed_overhead:.0%} extra bytes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 256,
+         float(sys.argv[3]) if len(sys.argv) > 3 else 0.02)
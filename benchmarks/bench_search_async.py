@@ -0,0 +1,52 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Benchmark for Searcher.search_archive_async against the threaded search_archive.
+# Runs against a local stub STAC server with simulated latency:
+#   python -m benchmarks.bench_search_async [num_items] [latency_sec]
+
+import sys
+import time
+import asyncio
+from shapely.geometry import box
+
+from spotlite.search import Searcher
+from benchmarks.stub_stac_server import StubStacServer, make_items
+
+
+def make_searcher(url):
+    searcher = Searcher()
+    searcher.stac_api_url = url
+    searcher.use_search_cache = False
+    searcher.adaptive_chunking = False
+    searcher.search_page_size = 50
+    return searcher
+
+
+def main(num_items, latency_sec):
+    aoi = box(-58.6, -34.7, -58.2, -34.3)
+    with StubStacServer(make_items(num_items), latency_sec=latency_sec) as server:
+        start = time.perf_counter()
+        threaded_gdf = make_searcher(server.url).search_archive(aoi, "2022-01-01", "2023-12-31")
+        threaded_sec = time.perf_counter() - start
+        threaded_requests = server.num_requests
+
+        start = time.perf_counter()
+        async_gdf = asyncio.run(make_searcher(server.url).search_archive_async(aoi, "2022-01-01", "2023-12-31"))
+        async_sec = time.perf_counter() - start
+        async_requests = server.num_requests - threaded_requests
+
+    assert sorted(threaded_gdf['id']) == sorted(async_gdf['id'])
+    print()
+    print(f"items: {num_items}, latency: {latency_sec}s per request")
+    print(f"threaded search_archive:      {threaded_sec:.2f}s, {threaded_requests} requests")
+    print(f"asyncio search_archive_async: {async_sec:.2f}s, {async_requests} requests ({threaded_sec / async_sec:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.05)
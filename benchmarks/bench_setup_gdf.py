@@ -0,0 +1,94 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Benchmark for Searcher._setup_GDF against the previous per-item implementation.
+# Uses synthetic STAC items so it runs offline:
+#   python -m benchmarks.bench_setup_gdf [num_items ...]
+
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+import geopandas as gpd
+import pandas as pd
+from pystac import Item, Asset, ItemCollection
+from shapely.geometry import box, mapping
+
+from spotlite.search import Searcher
+
+
+def make_items(num_items, seed=0):
+    rnd = random.Random(seed)
+    start = datetime(2022, 1, 1)
+    items = []
+    for index in range(num_items):
+        gx, gy = rnd.randint(0, 99), rnd.randint(0, 99)
+        footprint = box(gx * 0.02, gy * 0.02, (gx + 1) * 0.02, (gy + 1) * 0.02)
+        capture_date = start + timedelta(seconds=rnd.randint(0, 730 * 86400))
+        item = Item(
+            id=f"item-{index}",
+            geometry=mapping(footprint),
+            bbox=list(footprint.bounds),
+            datetime=capture_date,
+            properties={
+                "proj:epsg": 32721,
+                "grid:code": f"SAT:{gx}-{gy}",
+                "satl:outcome_id": f"outcome-{index // 20}",
+                "satl:valid_pixel": 100,
+                "satl:product_version": "1.1.0",
+                "eo:cloud_cover": rnd.randint(0, 100),
+            },
+        )
+        for role in ("preview", "thumbnail", "analytic"):
+            item.add_asset(role, Asset(href=f"https://example.com/{index}/{role}.tif"))
+        items.append(item)
+    return ItemCollection(items)
+
+
+def legacy_setup_gdf(items):
+    """The per-item implementation that Searcher._setup_GDF replaced."""
+    first_epsg_code = f"epsg:{items.items[0].properties.get('proj:epsg', None)}"
+    gdfs = []
+    for item in items:
+        gdf = gpd.GeoDataFrame.from_features([item.to_dict()], crs=first_epsg_code)
+        gdf['id'] = item.id
+        gdf['capture_date'] = pd.to_datetime(item.datetime)
+        gdf['capture_date'] = gdf['capture_date'].dt.tz_localize(None)
+        gdf['geometry'] = gdf['geometry'].apply(lambda x: x.buffer(0))
+        gdf['data_age'] = (datetime.utcnow() - gdf['capture_date']).dt.days
+        gdf['preview_url'] = item.assets["preview"].href
+        gdf['thumbnail_url'] = item.assets["thumbnail"].href
+        gdf['analytic_url'] = item.assets["analytic"].href
+        gdf['outcome_id'] = item.properties['satl:outcome_id']
+        gdf['valid_pixel_percent'] = item.properties['satl:valid_pixel']
+        gdfs.append(gdf)
+    combined_gdf = pd.concat(gdfs, ignore_index=True)
+    tile_counts = combined_gdf['grid:code'].value_counts().reset_index()
+    tile_counts.columns = ['grid:code', 'image_count']
+    return pd.merge(combined_gdf, tile_counts, on='grid:code', how='left')
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    searcher = Searcher()
+    print(f"{'items':>8} {'legacy_s':>10} {'columnar_s':>11} {'speedup':>8}")
+    for num_items in sizes:
+        items = make_items(num_items)
+        new_gdf, new_sec = timed(searcher._setup_GDF, items)
+        old_gdf, old_sec = timed(legacy_setup_gdf, items)
+        assert list(old_gdf['id']) == list(new_gdf['id'])
+        assert list(old_gdf['image_count']) == list(new_gdf['image_count'])
+        print(f"{num_items:>8} {old_sec:>10.2f} {new_sec:>11.2f} {old_sec / new_sec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
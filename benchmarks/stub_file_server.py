@@ -0,0 +1,124 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Minimal local HTTP file server used by the benchmarks to exercise the tile downloader offline.
+# Serves in-memory files with HEAD, ETag and single Range/If-Range support, an optional per-request
+# latency and an optional number of bytes after which the first response of each file is cut off.
+
+import os
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _Server(ThreadingHTTPServer):
+    # GDAL opens many parallel connections for windowed reads.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubFileServer:
+    def __init__(self, files, latency_sec=0.0, drop_after_bytes=None):
+        self.files = files
+        self.etags = {name: f'"{hashlib.md5(data).hexdigest()}"' for name, data in files.items()}
+        self.latency_sec = latency_sec
+        self.drop_after_bytes = drop_after_bytes
+        self.num_requests = 0
+        self.bytes_sent = 0
+        self._dropped = set()
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def file_url(self, name):
+        return f"{self.url}/{name}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _file(self):
+                with stub._lock:
+                    stub.num_requests += 1
+                time.sleep(stub.latency_sec)
+                name = self.path.lstrip("/")
+                if name not in stub.files:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return None, None
+                return name, stub.files[name]
+
+            def do_HEAD(self):
+                name, data = self._file()
+                if name is None:
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", stub.etags[name])
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+            def do_GET(self):
+                name, data = self._file()
+                if name is None:
+                    return
+
+                start, end = 0, len(data) - 1
+                range_header = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+                if range_header and (if_range is None or if_range == stub.etags[name]):
+                    first, last = range_header.split("=")[1].split(",")[0].split("-")
+                    start = int(first)
+                    if last:
+                        end = min(int(last), len(data) - 1)
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                body = data[start:end + 1]
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", stub.etags[name])
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+                # Cut the first response of each file short to simulate a dropped connection.
+                with stub._lock:
+                    drop = stub.drop_after_bytes is not None and name not in stub._dropped
+                    stub._dropped.add(name)
+                if drop:
+                    body = body[:stub.drop_after_bytes]
+                    self.close_connection = True
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+
+        return Handler
+
+
+def make_files(num_files, size_bytes):
+    return {f"tile-{index}.tif": os.urandom(size_bytes) for index in range(num_files)}
@@ -0,0 +1,166 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Minimal local STAC API used by the benchmarks to exercise the search code offline.
+# Serves a landing page and a paginated POST /search over synthetic quickview items,
+# with an optional per-request latency to mimic the real archive, and optional throttling
+# that answers every Nth search with a 429.
+
+import json
+import time
+import random
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CONFORMANCE = [
+    "https://api.stacspec.org/v1.0.0/core",
+    "https://api.stacspec.org/v1.0.0/item-search",
+    "https://api.stacspec.org/v1.0.0/item-search#query",
+    "https://api.stacspec.org/v1.0.0/item-search#fields",
+]
+
+
+def make_items(num_items, start=datetime(2022, 1, 1, tzinfo=timezone.utc), days=730, seed=0):
+    rnd = random.Random(seed)
+    items = []
+    for index in range(num_items):
+        gx, gy = rnd.randint(0, 19), rnd.randint(0, 19)
+        x0, y0 = -58.6 + gx * 0.02, -34.7 + gy * 0.02
+        capture_date = start + timedelta(seconds=rnd.randint(0, days * 86400))
+        outcome_id = f"outcome-{index // 10}"
+        items.append({
+            "type": "Feature",
+            "stac_version": "1.0.0",
+            "id": f"item-{index}",
+            "collection": "quickview-visual",
+            "geometry": {"type": "Polygon", "coordinates": [[[x0, y0], [x0 + 0.02, y0], [x0 + 0.02, y0 + 0.02],
+                                                             [x0, y0 + 0.02], [x0, y0]]]},
+            "bbox": [x0, y0, x0 + 0.02, y0 + 0.02],
+            "properties": {
+                "datetime": capture_date.isoformat().replace("+00:00", "Z"),
+                "proj:epsg": 32721,
+                "grid:code": f"SAT:{gx}-{gy}",
+                "satl:outcome_id": outcome_id,
+                "satl:valid_pixel": rnd.choice([100, 100, 90]),
+                "satl:product_version": rnd.choice(["1.0.0", "1.1.0"]),
+                "eo:cloud_cover": rnd.randint(0, 60),
+            },
+            "assets": {role: {"href": f"https://example.com/{outcome_id}/item-{index}_{role}.tif"}
+                       for role in ("preview", "thumbnail", "analytic")},
+            "links": [],
+        })
+    return items
+
+
+def _parse_datetime(value):
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _matches(item, body):
+    properties = item["properties"]
+    if body.get("ids") and item["id"] not in body["ids"]:
+        return False
+    for name, operations in (body.get("query") or {}).items():
+        value = properties.get(name)
+        for operation, expected in operations.items():
+            if operation == "eq" and value != expected:
+                return False
+            if operation == "in" and value not in expected:
+                return False
+            if operation == "lte" and (value is None or value > expected):
+                return False
+            if operation == "gte" and (value is None or value < expected):
+                return False
+    return True
+
+
+class StubStacServer:
+    def __init__(self, items, latency_sec=0.0, throttle_every=0):
+        # Items are kept sorted by capture date so datetime ranges are a bisect instead of a scan.
+        self.items = sorted(items, key=lambda item: _parse_datetime(item["properties"]["datetime"]))
+        self.capture_dates = [_parse_datetime(item["properties"]["datetime"]) for item in self.items]
+        self.latency_sec = latency_sec
+        self.throttle_every = throttle_every
+        self.num_requests = 0
+        self.num_throttled = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _count(self):
+                with stub._lock:
+                    stub.num_requests += 1
+                    is_throttled = self.command == "POST" and stub.throttle_every and stub.num_requests % stub.throttle_every == 0
+                    stub.num_throttled += bool(is_throttled)
+                time.sleep(stub.latency_sec)
+                return is_throttled
+
+            def do_GET(self):
+                self._count()
+                if self.path.rstrip("/") == "":
+                    return self._send({
+                        "type": "Catalog", "id": "stub", "description": "Stub STAC API", "stac_version": "1.0.0",
+                        "conformsTo": CONFORMANCE,
+                        "links": [
+                            {"rel": "self", "href": f"{stub.url}/"},
+                            {"rel": "root", "href": f"{stub.url}/"},
+                            {"rel": "search", "href": f"{stub.url}/search", "method": "POST"},
+                        ],
+                    })
+                if self.path.startswith("/collections"):
+                    return self._send({"collections": [], "links": []})
+                self._send({"code": "NotFound"}, status=404)
+
+            def do_POST(self):
+                is_throttled = self._count()
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if is_throttled:
+                    return self._send({"code": "TooManyRequests"}, status=429)
+                candidates = stub.items
+                if body.get("datetime"):
+                    start, end = (_parse_datetime(value) for value in body["datetime"].split("/"))
+                    candidates = stub.items[bisect_left(stub.capture_dates, start):bisect_right(stub.capture_dates, end)]
+                matched = [item for item in candidates if _matches(item, body)]
+                limit = int(body.get("limit") or 10)
+                offset = int(body.get("token") or 0)
+                links = []
+                if offset + limit < len(matched):
+                    links.append({"rel": "next", "href": f"{stub.url}/search", "method": "POST",
+                                  "body": {**body, "token": offset + limit}})
+                self._send({"type": "FeatureCollection", "features": matched[offset:offset + limit],
+                            "links": links, "numberMatched": len(matched)})
+
+        return Handler
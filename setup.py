@@ -12,6 +12,8 @@ setup(
     packages=find_packages(exclude=('tests', 'docs')),  # Automatically find your package
     install_requires=[
         'affine==2.4.0',
+        'aiohttp==3.9.5',
+        'aiosignal==1.3.1',
         'attrs==23.1.0',
         'branca==0.6.0',
         'cachetools==5.3.2',
@@ -25,6 +27,7 @@ setup(
         'fiona==1.9.5',
         'folium==0.14.0',
         'fonttools==4.43.1',
+        'frozenlist==1.4.1',
         'geographiclib==2.0',
         'geojson==3.0.1',
         'geopandas==0.14.0',
@@ -39,6 +42,7 @@ setup(
         'kiwisolver==1.4.5',
         'MarkupSafe==2.1.3',
         'matplotlib==3.8.1',
+        'multidict==6.0.5',
         'numpy==1.26.1',
         'oauthlib==3.2.2',
         'outcome==1.3.0.post0',
@@ -76,6 +80,7 @@ setup(
         'uritemplate==4.1.1',
         'urllib3==2.0.7',
         'wsproto==1.2.0',
+        'yarl==1.9.4',
         'google-api-python-client>=2.114.0',
         'google_auth_oauthlib>=1.2.0'
     ],
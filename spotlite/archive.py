@@ -0,0 +1,341 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the long-lived connection to the
+# STAC archive that is shared by all searches of a Searcher.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class RequestScheduler Methods
+#   call
+#   call_async
+#
+# Class ArchiveConnection Methods
+#   client
+#   fetch_page
+#   open_async_session
+#   fetch_page_async
+#   next_page_request
+#   get_collections
+#   close
+
+from typing import Dict, Optional, List
+import asyncio
+import threading
+import time
+import random
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests
+import aiohttp
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pystac_client import Client
+from pystac_client.stac_api_io import StacApiIO
+
+logger = logging.getLogger(__name__)
+
+# Responses that are worth retrying, and those that mean the archive is throttling us.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+
+# Failures to reach the archive at all, which are retried like the retryable responses.
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                     aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+class ArchiveRequestError(Exception):
+    """Raised for archive responses with a retryable status code."""
+    def __init__(self, status_code: int, retry_after_sec: Optional[float] = None, url: str = ""):
+        super().__init__(f"Archive returned HTTP {status_code} for {url}")
+        self.status_code = status_code
+        self.retry_after_sec = retry_after_sec
+
+def _find_request_error(exc: BaseException) -> Optional[ArchiveRequestError]:
+    """Finds the ArchiveRequestError behind an exception, pystac_client re-raises it as an APIError."""
+    while exc is not None:
+        if isinstance(exc, ArchiveRequestError):
+            return exc
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class RequestScheduler:
+    def __init__(self, max_concurrency=10, max_retries=6, base_delay_sec=1.0, max_delay_sec=60.0):
+        """Runs archive requests with retries and an adaptive concurrency limit.
+        Retries use jittered exponential backoff and honour Retry-After.  The limit is halved when the
+        archive throttles and grows back by one request per round of successful requests (AIMD)."""
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+
+        self._limit = float(max_concurrency)
+        self._active = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters = []
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, int(self._limit))
+
+    def call(self, func, *args, **kwargs):
+        """Calls func under the concurrency limit, retrying throttled and transient failures.
+        Raises the last exception once max_retries is exhausted."""
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                self._release()
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._release()
+            self._increase()
+            return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """Awaits the coroutine function func under the same concurrency limit and retries as call.
+        Waiting for a free slot or a retry does not block the event loop."""
+        attempt = 0
+        while True:
+            await self._acquire_async()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as exc:
+                self._release()
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self._release()
+            self._increase()
+            return result
+
+    def _retry_delay(self, exc, attempt) -> Optional[float]:
+        """The delay before retrying a failed request, None if it should not be retried."""
+        request_error = _find_request_error(exc)
+        if (request_error is None and not isinstance(exc, CONNECTION_ERRORS)) or attempt >= self.max_retries:
+            return None
+
+        retry_after_sec = None
+        if request_error is not None:
+            retry_after_sec = request_error.retry_after_sec
+            if request_error.status_code in THROTTLE_STATUS_CODES:
+                self._decrease()
+
+        delay = self._backoff_delay(attempt, retry_after_sec)
+        logger.warning(f"Archive request failed ({exc}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s "
+                       f"with concurrency {self.concurrency}.")
+        return delay
+
+    def _backoff_delay(self, attempt, retry_after_sec=None) -> float:
+        # Full jitter keeps the retries of parallel workers from hitting the archive at the same time.
+        delay = random.uniform(0, min(self.max_delay_sec, self.base_delay_sec * 2 ** attempt))
+        if retry_after_sec is not None:
+            delay = max(delay, retry_after_sec)
+        return delay
+
+    def _acquire(self):
+        with self._condition:
+            while self._active >= self.concurrency:
+                self._condition.wait()
+            self._active += 1
+
+    async def _acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._active < self.concurrency:
+                    self._active += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._notify_all()
+
+    def _increase(self):
+        with self._condition:
+            if self._limit < self.max_concurrency:
+                self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self._limit)
+                self._notify_all()
+
+    def _notify_all(self):
+        # Wakes the waiting threads and coroutines, the caller holds the condition.
+        self._condition.notify_all()
+        for loop, waiter in self._async_waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+        self._async_waiters = []
+
+    def _decrease(self):
+        with self._condition:
+            # Requests in flight when the archive starts throttling all fail together, count them as one event.
+            now = time.monotonic()
+            if now - self._last_decrease >= self.base_delay_sec:
+                self._limit = max(1.0, self._limit / 2)
+                self._last_decrease = now
+                logger.warning(f"Archive is throttling, reducing concurrency to {self.concurrency}.")
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class ArchiveConnection:
+    def __init__(self, stac_api_url: str, key_id="", key_secret="", pool_size=20, collections_ttl_sec=3600):
+        self.stac_api_url = stac_api_url
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.pool_size = pool_size
+        self.collections_ttl_sec = collections_ttl_sec
+        self.timeout = 60
+
+        self.scheduler = RequestScheduler(max_concurrency=pool_size)
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._search_url = None
+        self._collections = None
+        self._collections_fetched_at = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"authorizationToken": f"Key,Secret {self.key_id},{self.key_secret}"}
+
+    @property
+    def session(self):
+        """The pooled keep-alive session used for every request to the archive."""
+        return self.client._stac_io.session
+
+    def matches(self, stac_api_url: str, key_id: str, key_secret: str) -> bool:
+        """True if this connection was opened for the given endpoint and credentials."""
+        return (self.stac_api_url, self.key_id, self.key_secret) == (stac_api_url, key_id, key_secret)
+
+    @property
+    def client(self) -> Client:
+        """Opens the archive on first use and returns the shared Client afterwards.
+        Opening reads the landing page, which doubles as the connectivity check."""
+        if self._client is not None:
+            return self._client
+
+        with self._lock:
+            if self._client is None:
+                self._client = self._open()
+        return self._client
+
+    @property
+    def search_url(self) -> str:
+        """The search endpoint, resolved once per connection.  Resolving the link can read the landing page again."""
+        client = self.client
+        with self._lock:
+            if self._search_url is None:
+                link = client.get_single_link("search")
+                self._search_url = link.href if link is not None else f"{self.stac_api_url.rstrip('/')}/search"
+            return self._search_url
+
+    def fetch_page(self, request: Dict) -> Dict:
+        """Fetches one page of search results.  The request is a dict with 'href', 'method' and 'body'."""
+        if request['method'] == 'POST':
+            response = self.session.post(request['href'], json=request['body'], timeout=self.timeout)
+        else:
+            response = self.session.get(request['href'], timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def open_async_session(self) -> aiohttp.ClientSession:
+        """Opens an aiohttp session for fetch_page_async, sized like the pooled session.  Must be called
+        from a running event loop, and closed by the caller."""
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        return aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def fetch_page_async(self, session: aiohttp.ClientSession, request: Dict) -> Dict:
+        """Async fetch_page on a session from open_async_session."""
+        body = request['body'] if request['method'] == 'POST' else None
+        async with session.request(request['method'], request['href'], json=body) as response:
+            if response.status in RETRYABLE_STATUS_CODES:
+                raise ArchiveRequestError(response.status, _parse_retry_after(response.headers.get('Retry-After')), str(response.url))
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    def next_page_request(self, page: Dict, request: Dict) -> Optional[Dict]:
+        """Builds the request for the page after this one from its STAC 'next' link, None on the last page."""
+        next_link = next((link for link in page.get('links', []) if link.get('rel') == 'next'), None)
+        if next_link is None:
+            return None
+
+        method = next_link.get('method', 'GET').upper()
+        body = next_link.get('body')
+        if method == 'POST' and next_link.get('merge', False):
+            body = {**request['body'], **(body or {})}
+        return {'href': next_link['href'], 'method': method, 'body': body}
+
+    def get_collections(self) -> List:
+        """Returns the archive collections, refreshed at most once per collections_ttl_sec."""
+        client = self.client  # Opened before taking the lock, which opening the client takes too.
+        with self._lock:
+            now = time.monotonic()
+            is_stale = (self._collections_fetched_at is None or
+                        now - self._collections_fetched_at > self.collections_ttl_sec)
+            if is_stale:
+                self._collections = list(client.get_all_collections())
+                self._collections_fetched_at = now
+                for collection in self._collections:
+                    logger.debug(f"Collection ID: {collection.id}, Title: {collection.title}")
+            return self._collections
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client._stac_io.session.close()
+            self._client = None
+            self._search_url = None
+            self._collections = None
+            self._collections_fetched_at = None
+
+    def _open(self) -> Client:
+        logger.debug("Opening archive connection: %s", self.stac_api_url)
+        stac_io = StacApiIO(headers=self.headers, timeout=self.timeout)
+
+        # Size the connection pool for the search workers so connections are kept alive and reused.
+        # Only connection failures are retried here, retryable responses are left to the scheduler.
+        retries = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retries)
+        stac_io.session.mount("http://", adapter)
+        stac_io.session.mount("https://", adapter)
+        stac_io.session.hooks['response'].append(self._raise_for_retryable_status)
+
+        client = self.scheduler.call(Client.open, self.stac_api_url, stac_io=stac_io)
+        logger.debug("Connection test successful: %s", client.id)
+        return client
+
+    def _raise_for_retryable_status(self, response, *args, **kwargs):
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after_sec = _parse_retry_after(response.headers.get('Retry-After'))
+            # Release the pooled connection, the caller never sees this response.
+            response.close()
+            raise ArchiveRequestError(response.status_code, retry_after_sec, response.url)
@@ -0,0 +1,222 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the local cache of tile assets shared
+# by the TileManager operations.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class AssetCache Methods
+#   get_path
+#   get_paths
+#   open
+#   link
+#   clear
+
+from typing import Tuple, Optional, List, Callable
+import os
+import shutil
+import hashlib
+import threading
+import logging
+from contextlib import ExitStack
+from urllib.parse import urlparse
+import rasterio
+
+from .catalog import tile_url
+from .download import TileDownloader
+
+logger = logging.getLogger(__name__)
+
+# GDAL options for windowed reads of remote COGs: no directory listing on open, adjacent
+# ranges merged into one request and fetched blocks kept in memory.
+REMOTE_READ_OPTIONS = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "VSI_CACHE": "TRUE",
+}
+
+class AssetCache:
+    def __init__(self, cache_dir="databases/asset_cache", max_size_mb=2000, downloader=None):
+        """Local copies of tile assets keyed by item id and asset role.
+        Assets are fetched once through the downloader and read from local disk after that, the
+        least recently used ones are evicted once the cache grows over max_size_mb."""
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        self.downloader = downloader if downloader is not None else TileDownloader()
+        self.last_cache_stats = {}
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get_path(self, tile, role: str) -> Optional[str]:
+        """Local path of an asset of a tile, fetched on a cache miss.  None if it cannot be fetched."""
+        url = tile_url(tile, role)
+        if not isinstance(url, str):
+            logger.warning(f"Tile {tile['id']} has no {role} asset.")
+            return None
+
+        path = self._path(tile['id'], role, url)
+        with self._key_lock(path):
+            if self._touch(path):
+                return path
+            try:
+                self.downloader.download_file(url, path)
+            except Exception as e:
+                logger.error(f"Failed to fetch the {role} asset of {tile['id']}: {e}")
+                return None
+
+        with self._lock:
+            self._evict(keep={path})
+        return path
+
+    def get_paths(self, tiles, role: str, on_progress: Optional[Callable[[int, int], None]] = None) -> List[Optional[str]]:
+        """Local paths of an asset of many tiles, a GeoDataFrame or a list of rows.
+        Cache misses are fetched in parallel.  The paths of failed tiles are None."""
+        if hasattr(tiles, 'iterrows'):
+            tiles = [tile for _, tile in tiles.iterrows()]
+
+        paths = [None] * len(tiles)
+        misses = {}  # Cached path -> (url, indexes of the tiles sharing the asset)
+        for index, tile in enumerate(tiles):
+            url = tile_url(tile, role)
+            if not isinstance(url, str):
+                logger.warning(f"Tile {tile['id']} has no {role} asset.")
+                continue
+            path = self._path(tile['id'], role, url)
+            if path in misses:
+                misses[path][1].append(index)
+            elif self._touch(path):
+                paths[index] = path
+            else:
+                misses[path] = (url, [index])
+
+        num_hits = sum(path is not None for path in paths)
+        with ExitStack() as stack:
+            # Hold the key locks of the misses so get_path and other calls do not fetch them at the same time.
+            # They are taken in path order, so two calls never wait on each other.
+            for path in sorted(misses):
+                stack.enter_context(self._key_lock(path))
+            for path in [path for path in misses if self._touch(path)]:
+                indexes = misses.pop(path)[1]
+                for index in indexes:
+                    paths[index] = path
+                num_hits += len(indexes)
+
+            jobs = [(url, path) for path, (url, _) in misses.items()]
+            if jobs:
+                downloaded = self.downloader.download(jobs, on_progress)
+                for path, (_, indexes) in zip(downloaded, misses.values()):
+                    for index in indexes:
+                        paths[index] = path
+            elif on_progress is not None:
+                on_progress(1, 1)
+
+        self.last_cache_stats = {'hits': num_hits, 'misses': len(jobs), 'failed': paths.count(None)}
+        logger.info(f"Asset cache, {role}: {num_hits} hits, {len(jobs)} fetched.")
+
+        with self._lock:
+            # The assets of this call stay, even if they alone exceed the budget.
+            self._evict(keep={path for path in paths if path is not None})
+        return paths
+
+    def open(self, tile, role: str, fetch=True):
+        """Opens an asset of a tile with rasterio from its local copy.  None if it cannot be fetched.
+        With fetch False an asset missing from the cache is opened remotely instead, so windowed reads
+        only transfer the blocks they need."""
+        url = tile_url(tile, role)
+        if not fetch and isinstance(url, str):
+            path = self._path(tile['id'], role, url)
+            if self._touch(path):
+                return rasterio.open(path)
+            try:
+                with rasterio.Env(**REMOTE_READ_OPTIONS):
+                    return rasterio.open(url)
+            except Exception as e:
+                logger.info(f"Cannot read {url} remotely, fetching it: {e}")
+
+        path = self.get_path(tile, role)
+        if path is None:
+            return None
+        return rasterio.open(path)
+
+    def link(self, path: str, output_path: str) -> str:
+        """Places a cached asset at output_path, as a hard link when the file system allows it."""
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{output_path}.tmp"
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, output_path)
+        return output_path
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+
+    def _path(self, item_id, role, url) -> str:
+        # Content addressed by item and role, items in the archive do not change once published.
+        key = hashlib.sha1(f"{item_id}|{role}".encode()).hexdigest()
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        return os.path.join(self.cache_dir, key[:2], f"{key}{extension}")
+
+    def _key_lock(self, path) -> threading.Lock:
+        # One fetch per asset, concurrent readers of the same asset wait for it.
+        with self._lock:
+            return self._key_locks.setdefault(path, threading.Lock())
+
+    def _touch(self, path) -> bool:
+        """Marks an entry as recently used for eviction, False if it is not cached."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for directory in os.scandir(self.cache_dir):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                # Partial downloads and ETag sidecars are removed with their asset.
+                if entry.name.startswith('.') or entry.name.endswith('.part'):
+                    continue
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self, keep=()):
+        """Removes the least recently used entries until the cache fits in max_size_mb."""
+        max_size_bytes = self.max_size_mb * 1024 * 1024
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total_size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total_size <= max_size_bytes:
+                break
+            if path in keep:
+                continue
+            # Readers holding the file open keep reading it, the file system frees it after them.
+            self._remove(path)
+            self._key_locks.pop(path, None)
+            total_size -= size
+            logger.debug(f"Evicted asset cache entry: {path}")
+
+    def _remove(self, path):
+        for name in (path, f"{path}.part"):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+        directory, name = os.path.split(path)
+        for etag_name in (f".{name}.etag", f".{name}.part.etag"):
+            try:
+                os.remove(os.path.join(directory, etag_name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,142 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the on-disk cache of archive search
+# results used by the Searcher class.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class SearchCache Methods
+#   windows
+#   load
+#   store
+#   clear
+
+from typing import Tuple, Dict, Optional, List
+import os
+import gzip
+import json
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+import shapely
+from shapely.geometry import Polygon
+from pystac import ItemCollection
+
+logger = logging.getLogger(__name__)
+
+# Windows are aligned to a fixed origin so that overlapping searches share the same cache entries.
+WINDOW_ORIGIN = datetime(1970, 1, 1)
+
+def parse_date(date_str: str) -> datetime:
+    """Parses an ISO date string into a naive UTC datetime."""
+    date = datetime.fromisoformat(date_str)
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+def aoi_hash(aoi: Polygon) -> str:
+    """Stable hash of an AOI geometry, independent of vertex order."""
+    return hashlib.sha1(shapely.normalize(aoi).wkb).hexdigest()
+
+class SearchCache:
+    def __init__(self, cache_dir="databases/search_cache", window_days=30, immutable_after_days=30, max_size_mb=500):
+        self.cache_dir = cache_dir
+        self.window_days = window_days
+        self.immutable_after_days = immutable_after_days
+        self.max_size_mb = max_size_mb
+        self._lock = threading.Lock()
+
+    def windows(self, start_date: str, end_date: str) -> List[Tuple[str, str, bool]]:
+        """Splits a date range on the cache window grid.
+        Returns (start, end, is_cacheable) tuples.  A window is cacheable when it lies entirely
+        inside the range and ends before the immutable horizon, so its results can no longer change."""
+        start = parse_date(start_date)
+        end = parse_date(end_date)
+        window = timedelta(days=self.window_days)
+        horizon = datetime.utcnow() - timedelta(days=self.immutable_after_days)
+
+        windows = []
+        window_start = WINDOW_ORIGIN + ((start - WINDOW_ORIGIN) // window) * window
+        while window_start < end:
+            window_end = window_start + window
+            chunk_start = max(window_start, start)
+            chunk_end = min(window_end, end)
+            is_cacheable = chunk_start == window_start and chunk_end == window_end and window_end <= horizon
+            windows.append((chunk_start.isoformat(), chunk_end.isoformat(), is_cacheable))
+            window_start = window_end
+
+        return windows
+
+    def load(self, aoi: Polygon, collection: str, start_date: str, end_date: str, params: Optional[Dict] = None) -> Optional[ItemCollection]:
+        """Returns the cached items for a window, or None on a cache miss.
+        Searches with different query or fields parameters are cached separately."""
+        path = self._path(aoi, collection, start_date, end_date, params)
+        try:
+            with gzip.open(path, 'rt') as f:
+                items = ItemCollection.from_dict(json.load(f))
+            os.utime(path)  # Mark as recently used for eviction.
+            return items
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable search cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+    def store(self, aoi: Polygon, collection: str, start_date: str, end_date: str, items: ItemCollection,
+              params: Optional[Dict] = None):
+        """Writes the items of a window, including empty windows so they are not searched again."""
+        path = self._path(aoi, collection, start_date, end_date, params)
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            try:
+                with gzip.open(tmp_path, 'wt') as f:
+                    json.dump(items.to_dict(), f)
+                os.replace(tmp_path, path)  # Atomic, readers never see a partial entry.
+            except Exception as e:
+                logger.warning(f"Failed to write search cache entry {path}: {e}")
+                self._remove(tmp_path)
+                return
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+
+    def _path(self, aoi, collection, start_date, end_date, params=None) -> str:
+        key = f"{aoi_hash(aoi)}|{collection}|{start_date}|{end_date}"
+        if params:
+            key += f"|{json.dumps(params, sort_keys=True)}"
+        return os.path.join(self.cache_dir, f"{hashlib.sha1(key.encode()).hexdigest()}.json.gz")
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json.gz"):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in max_size_mb."""
+        max_size_bytes = self.max_size_mb * 1024 * 1024
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total_size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total_size <= max_size_bytes:
+                break
+            self._remove(path)
+            total_size -= size
+            logger.debug(f"Evicted search cache entry: {path}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,99 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the compact representation of the
+# tile catalogs returned by the Searcher class.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Functions:
+#   compact_catalog
+#   expand_catalog
+#   tile_url
+
+from typing import Optional, List
+import logging
+import pandas as pd
+import geopandas as gpd
+
+logger = logging.getLogger(__name__)
+
+# Asset roles exposed as '<role>_url' columns in the search results.
+ASSET_ROLES = ["preview", "thumbnail", "analytic"]
+
+# String properties holding timestamps, stored as datetime64 in a compact catalog.
+DATETIME_COLUMNS = ["datetime", "created", "updated", "start_datetime", "end_datetime"]
+
+# Placeholders of the URL templates, filled from the tile's columns of the same name.
+URL_PLACEHOLDERS = ["id", "outcome_id"]
+
+def compact_catalog(tiles_gdf: gpd.GeoDataFrame, max_category_ratio=0.5) -> gpd.GeoDataFrame:
+    """Returns a memory-compact copy of a search result.
+    Asset URLs become categorical templates with '{id}' and '{outcome_id}' placeholders, read them
+    with tile_url.  grid:code and every string column repeating its values (at most max_category_ratio
+    unique values per row) become categoricals, numbers are downcast and timestamps parsed.
+    Geometries already are a shapely 2 geometry array and are kept as is."""
+    if tiles_gdf.empty:
+        return tiles_gdf
+
+    tiles_gdf = tiles_gdf.copy()
+    for role in ASSET_ROLES:
+        column = f'{role}_url'
+        if column in tiles_gdf.columns and _is_text(tiles_gdf[column]):
+            tiles_gdf[column] = pd.Categorical(_url_templates(tiles_gdf, column))
+
+    for column in tiles_gdf.columns:
+        if column == tiles_gdf.geometry.name:
+            continue
+        values = tiles_gdf[column]
+        if column in DATETIME_COLUMNS and _is_text(values):
+            tiles_gdf[column] = pd.to_datetime(values, utc=True, errors='coerce').dt.tz_localize(None)
+        elif pd.api.types.is_float_dtype(values):
+            tiles_gdf[column] = pd.to_numeric(values, downcast='float')
+        elif pd.api.types.is_integer_dtype(values):
+            tiles_gdf[column] = pd.to_numeric(values, downcast='integer')
+        elif _is_text(values):
+            try:
+                num_unique = values.nunique(dropna=False)
+            except TypeError:
+                continue  # Lists and dicts are not hashable, keep them as objects.
+            if column == 'grid:code' or num_unique <= max_category_ratio * len(values):
+                tiles_gdf[column] = values.astype('category')
+
+    return tiles_gdf
+
+def expand_catalog(tiles_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """Returns a copy of a compact catalog with full URL strings in the '<role>_url' columns."""
+    tiles_gdf = tiles_gdf.copy()
+    for role in ASSET_ROLES:
+        column = f'{role}_url'
+        if column in tiles_gdf.columns:
+            tiles_gdf[column] = [tile_url(tile, role) for _, tile in tiles_gdf.iterrows()]
+    return tiles_gdf
+
+def tile_url(tile, role: str) -> Optional[str]:
+    """The URL of an asset of a tile, for rows of both compact and regular catalogs."""
+    url = tile[f'{role}_url']
+    if not isinstance(url, str) or '{' not in url:
+        return url
+    for name in URL_PLACEHOLDERS:
+        url = url.replace(f'{{{name}}}', str(tile[name]))
+    return url
+
+def _is_text(values) -> bool:
+    # Object columns on pandas < 3, the dedicated string dtype after.
+    return values.dtype == object or pd.api.types.is_string_dtype(values)
+
+def _url_templates(tiles_gdf, column) -> List:
+    templates = []
+    for url, *values in zip(tiles_gdf[column], *(tiles_gdf[name] for name in URL_PLACEHOLDERS)):
+        template = url
+        if isinstance(url, str):
+            for name, value in zip(URL_PLACEHOLDERS, values):
+                if isinstance(value, str) and value:
+                    template = template.replace(value, f'{{{name}}}')
+            # Keep the URL itself if the template would not expand back to it.
+            if tile_url({column: template, **dict(zip(URL_PLACEHOLDERS, values))}, column[:-len('_url')]) != url:
+                template = url
+        templates.append(template)
+    return templates
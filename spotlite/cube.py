@@ -0,0 +1,118 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the on-disk time-series datacube
+# built by the TileManager class from the captures of an AOI.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class StackCube Methods
+#   create
+#   append
+#   frame_metadata
+#   data, times, outcome_ids (properties)
+
+from typing import Dict, Optional, List
+import os
+import json
+import threading
+import logging
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class StackCube:
+    def __init__(self, cube_dir):
+        """An aligned (time, band, y, x) array on disk, opened from cube_dir.
+        The time slices are stored one after the other in data.bin, so a new slice is appended to the
+        end of the file, and data is a read-only memory map of it.  meta.json holds the grid and the
+        capture_date, outcome_id and cloud cover of every slice."""
+        self.cube_dir = cube_dir
+        self._lock = threading.Lock()
+        with open(self._meta_path, 'r') as f:
+            self._meta = json.load(f)
+
+    @classmethod
+    def create(cls, cube_dir, crs: str, transform: List[float], shape, dtype) -> 'StackCube':
+        """Creates an empty cube of (band, y, x) shaped slices on the grid of a CRS (WKT) and transform."""
+        os.makedirs(cube_dir, exist_ok=True)
+        meta = {'crs': crs, 'transform': list(transform), 'shape': list(shape), 'dtype': np.dtype(dtype).str, 'frames': []}
+        open(os.path.join(cube_dir, "data.bin"), 'wb').close()
+        _write_json(os.path.join(cube_dir, "meta.json"), meta)
+        return cls(cube_dir)
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.cube_dir, "meta.json")
+
+    @property
+    def _data_path(self) -> str:
+        return os.path.join(self.cube_dir, "data.bin")
+
+    @property
+    def crs(self) -> str:
+        return self._meta['crs']
+
+    @property
+    def transform(self) -> List[float]:
+        return self._meta['transform']
+
+    @property
+    def slice_shape(self):
+        return tuple(self._meta['shape'])
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self._meta['dtype'])
+
+    def __len__(self):
+        return len(self._meta['frames'])
+
+    @property
+    def data(self) -> np.ndarray:
+        """The (time, band, y, x) cube, memory-mapped read-only."""
+        shape = (len(self),) + self.slice_shape
+        if len(self) == 0:
+            return np.empty(shape, dtype=self.dtype)
+        return np.memmap(self._data_path, dtype=self.dtype, mode='r', shape=shape)
+
+    @property
+    def times(self) -> np.ndarray:
+        """The capture date of every time slice, as datetime64."""
+        return np.array([frame['capture_date'] for frame in self._meta['frames']], dtype='datetime64[s]')
+
+    @property
+    def outcome_ids(self) -> List[str]:
+        return [frame['outcome_id'] for frame in self._meta['frames']]
+
+    def frame_metadata(self) -> List[Dict]:
+        """The capture_date, outcome_id and cloud_cover of every time slice."""
+        return [dict(frame) for frame in self._meta['frames']]
+
+    def append(self, data: np.ndarray, capture_date: datetime, outcome_id: str, cloud_cover: Optional[float] = None):
+        """Appends a (band, y, x) time slice.  Slices are kept in capture date order, so a slice older than
+        the last one raises a ValueError."""
+        if tuple(data.shape) != self.slice_shape:
+            raise ValueError(f"Slice shape {data.shape} does not match the cube shape {self.slice_shape}.")
+        capture_date = capture_date.isoformat(timespec='seconds')
+        with self._lock:
+            if self._meta['frames'] and capture_date < self._meta['frames'][-1]['capture_date']:
+                raise ValueError(f"Slice {outcome_id} of {capture_date} is older than the last slice of the cube.")
+
+            # The data is written before the metadata, a crash in between leaves bytes no slice refers to.
+            expected_size = len(self) * int(np.prod(self.slice_shape)) * self.dtype.itemsize
+            with open(self._data_path, 'r+b') as f:
+                f.truncate(expected_size)
+                f.seek(expected_size)
+                np.ascontiguousarray(data, dtype=self.dtype).tofile(f)
+
+            self._meta['frames'].append({'capture_date': capture_date, 'outcome_id': outcome_id,
+                                         'cloud_cover': None if cloud_cover is None or np.isnan(cloud_cover) else float(cloud_cover)})
+            _write_json(self._meta_path, self._meta)
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
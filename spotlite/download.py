@@ -0,0 +1,231 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the parallel, resumable downloader
+# used by the TileManager class to fetch tile assets.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class TileDownloader Methods
+#   download
+#   download_file
+#   close
+
+from typing import Tuple, Optional, List, Callable
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+class TileDownloader:
+    def __init__(self, max_workers=8, chunk_size=64 * 1024, max_retries=3, timeout=60):
+        """Downloads files in parallel over one pooled session.
+        Files are written to '<path>.part' and renamed once complete, an interrupted download resumes
+        from its partial file with an HTTP Range request, and files already complete are skipped."""
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.last_download_stats = {}
+
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Keep-alive session with a connection per worker, created on first use."""
+        with self._lock:
+            if self._session is None:
+                retries = Retry(total=self.max_retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                                allowed_methods=["HEAD", "GET"], respect_retry_after_header=True)
+                adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retries)
+                self._session = requests.Session()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    def download(self, jobs: List[Tuple[str, str]], on_progress: Optional[Callable[[int, int], None]] = None) -> List[Optional[str]]:
+        """Downloads (url, path) jobs in parallel.  Returns the path of every job, None for the failed ones.
+        on_progress is called with (completed, total) as the jobs finish."""
+        start = time.perf_counter()
+        results = [None] * len(jobs)
+        num_bytes = 0
+        num_skipped = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_index = {executor.submit(self._download_job, url, path): index
+                               for index, (url, path) in enumerate(jobs)}
+            for completed, future in enumerate(as_completed(future_to_index), start=1):
+                index = future_to_index[future]
+                url, path = jobs[index]
+                try:
+                    job_bytes, is_skipped = future.result()
+                    results[index] = path
+                    num_bytes += job_bytes
+                    num_skipped += is_skipped
+                except Exception as e:
+                    logger.error(f"Failed to download {url} to {path}: {e}")
+                if on_progress is not None:
+                    on_progress(completed, len(jobs))
+
+        duration_sec = time.perf_counter() - start
+        num_failed = results.count(None)
+        mb_per_sec = num_bytes / 1024 / 1024 / duration_sec if duration_sec > 0 else 0.0
+        self.last_download_stats = {'files': len(jobs) - num_failed - num_skipped, 'skipped': num_skipped,
+                                    'failed': num_failed, 'bytes': num_bytes, 'seconds': duration_sec,
+                                    'mb_per_sec': mb_per_sec}
+        logger.warning(f"Downloaded {num_bytes / 1024 / 1024:.1f} MB in {duration_sec:.1f}s ({mb_per_sec:.1f} MB/s), "
+                       f"{len(jobs) - num_failed - num_skipped} files, {num_skipped} already complete, {num_failed} failed.")
+        return results
+
+    def download_file(self, url: str, path: str) -> str:
+        """Downloads a single file, resuming or skipping it as download does.  Raises on failure."""
+        self._download_job(url, path)
+        return path
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+    def _download_job(self, url, path) -> Tuple[int, bool]:
+        """Returns the number of bytes transferred and whether the file was already complete.
+        Dropped connections and truncated responses are resumed from the partial file."""
+        if os.path.exists(path) and self._is_complete(url, path):
+            logger.debug(f"Skipping complete file: {path}")
+            return 0, True
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        num_bytes = 0
+        attempt = 0
+        while True:
+            try:
+                return num_bytes + self._fetch(url, path), False
+            except requests.exceptions.HTTPError:
+                raise
+            except IOError as e:
+                # Covers the connection errors of requests as well.
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                num_bytes += getattr(e, 'num_bytes', 0)
+                logger.info(f"Download of {url} interrupted ({e}), resuming, retry {attempt}/{self.max_retries}.")
+                # The first resume is immediate, a dropped connection rarely means a struggling server.
+                time.sleep(0.5 * (2 ** (attempt - 1) - 1))
+
+    def _fetch(self, url, path) -> int:
+        """Fetches the rest of a file into its partial file and renames it once complete."""
+        part_path = f"{path}.part"
+        etag_path = self._etag_path(part_path)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        etag = self._read_etag(etag_path) if offset > 0 else None
+
+        headers = {}
+        if offset > 0:
+            headers['Range'] = f"bytes={offset}-"
+            if etag:
+                # Only resume if the file has not changed, otherwise the server sends all of it.
+                headers['If-Range'] = etag
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset > 0:
+                # The partial file already holds every byte.
+                total_size = self._range_total(response.headers.get('Content-Range'))
+                if total_size is not None and total_size != offset:
+                    self._remove(part_path)
+                    raise IOError(f"Partial file is {offset} bytes but the file is {total_size} bytes, restarting.")
+                self._finish(part_path, path, etag)
+                return 0
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                mode = 'ab'
+                total_size = self._range_total(response.headers.get('Content-Range'))
+            else:
+                mode, offset = 'wb', 0
+                content_length = response.headers.get('Content-Length')
+                total_size = int(content_length) if content_length is not None else None
+
+            etag = response.headers.get('ETag')
+            if etag:
+                self._write_etag(etag_path, etag)
+
+            num_bytes = 0
+            try:
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        num_bytes += len(chunk)
+            except IOError as e:
+                # Keep count of the bytes already in the partial file for the throughput.
+                e.num_bytes = num_bytes
+                raise
+
+        if total_size is not None and offset + num_bytes != total_size:
+            error = IOError(f"Incomplete download, got {offset + num_bytes} of {total_size} bytes.")
+            error.num_bytes = num_bytes
+            raise error
+
+        self._finish(part_path, path, etag)
+        return num_bytes
+
+    def _finish(self, part_path, path, etag):
+        # Atomic, a file at the final path is always complete.
+        os.replace(part_path, path)
+        self._remove(self._etag_path(part_path))
+        if etag:
+            self._write_etag(self._etag_path(path), etag)
+
+    def _is_complete(self, url, path) -> bool:
+        """Checks a local file against the size and ETag the server reports for it."""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            logger.debug(f"Could not check {url}, downloading again: {e}")
+            return False
+
+        content_length = response.headers.get('Content-Length')
+        if content_length is None or int(content_length) != os.path.getsize(path):
+            return False
+        etag = response.headers.get('ETag')
+        known_etag = self._read_etag(self._etag_path(path))
+        return etag is None or known_etag is None or etag == known_etag
+
+    def _etag_path(self, path) -> str:
+        directory, name = os.path.split(path)
+        return os.path.join(directory, f".{name}.etag")
+
+    def _read_etag(self, etag_path) -> Optional[str]:
+        try:
+            with open(etag_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_etag(self, etag_path, etag):
+        with open(etag_path, 'w') as f:
+            f.write(etag)
+
+    def _range_total(self, content_range) -> Optional[int]:
+        # Content-Range is 'bytes start-end/total' or 'bytes */total'.
+        if not content_range or '/' not in content_range:
+            return None
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,165 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the streaming animation encoders
+# used by the TileManager class to write tile stack animations.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class AnimationEncoder Methods
+#   append
+#   close
+#
+# Class ContactSheet Methods
+#   append
+#   close
+#
+# Functions
+#   open_encoder
+
+import os
+import math
+import time
+import logging
+import numpy as np
+import imageio
+import imageio.v3 as iio
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Output formats of the animations and their file extensions.
+ANIMATION_EXTENSIONS = {'gif': '.GIF', 'mp4': '.mp4', 'webp': '.webp'}
+
+# Output formats of the per-frame contact sheets and their file extensions.
+CONTACT_SHEET_EXTENSIONS = {'png': '.png', 'jpeg': '.jpg'}
+
+# Quality of each format when none is given, 0 to 100.  55 is CRF 23, the x264 default, higher
+# MP4 qualities quickly grow past the size of the GIF.  GIF and PNG are lossless and ignore it.
+DEFAULT_QUALITY = {'gif': None, 'mp4': 55, 'webp': 80, 'png': None, 'jpeg': 80}
+
+class AnimationEncoder:
+    def __init__(self, output_filename, format='gif', period_sec=2, quality=None):
+        """Encodes (height, width, 3) uint8 frames as they are appended, into a GIF, an animated WebP or an
+        H.264 MP4.  GIF and WebP are written by Pillow, which holds every frame until close, 1 byte a
+        pixel for GIF and 3 for WebP.  MP4 frames are piped to ffmpeg as they arrive, which needs the
+        imageio-ffmpeg package.  quality runs from 0 to 100, None uses the format's DEFAULT_QUALITY."""
+        if format not in ANIMATION_EXTENSIONS:
+            raise ValueError(f"Unknown animation format {format}, expected one of {list(ANIMATION_EXTENSIONS)}.")
+        self.output_filename = output_filename
+        self.format = format
+        self.period_sec = period_sec
+        self.quality = DEFAULT_QUALITY[format] if quality is None else quality
+        self.last_encode_stats = {}
+
+        self._num_frames = 0
+        self._start = time.perf_counter()
+        self._writer = self._open_writer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_writer(self):
+        duration_ms = self.period_sec * 1000
+        if self.format == 'gif':
+            return _GifWriter(self.output_filename, duration_ms)
+        if self.format == 'webp':
+            return iio.imopen(self.output_filename, "w", plugin="pillow", extension=".webp")
+        try:
+            return imageio.get_writer(self.output_filename, format="FFMPEG", mode="I", fps=1 / self.period_sec,
+                                      codec="libx264", pixelformat="yuv420p", quality=self.quality / 10, macro_block_size=1)
+        except ImportError as e:
+            raise ImportError(f"MP4 animations need the imageio-ffmpeg package, pip install imageio-ffmpeg: {e}") from e
+
+    def append(self, frame: np.ndarray):
+        """Encodes the next frame."""
+        if self.format == 'mp4':
+            # yuv420p needs even dimensions.
+            frame = frame[:frame.shape[0] // 2 * 2, :frame.shape[1] // 2 * 2]
+        if self.format == 'webp':
+            self._writer.write(frame, is_batch=False, duration=self.period_sec * 1000, loop=0, quality=self.quality)
+        else:
+            self._writer.append_data(frame)
+        self._num_frames += 1
+
+    def close(self):
+        """Finalizes the animation file."""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+
+        duration_sec = time.perf_counter() - self._start
+        size_bytes = os.path.getsize(self.output_filename) if os.path.isfile(self.output_filename) else 0
+        self.last_encode_stats = {'format': self.format, 'frames': self._num_frames, 'seconds': duration_sec, 'bytes': size_bytes}
+        logger.info(f"Encoded {self._num_frames} frames to {self.output_filename}: {size_bytes / 1024:.0f} KB in {duration_sec:.1f}s")
+
+class _GifWriter:
+    def __init__(self, output_filename, duration_ms):
+        """Writes a looping GIF with Pillow.  Frames are reduced to 256 colors as they arrive with the fast
+        octree quantizer, median cut, Pillow's default for RGB frames, takes several times longer."""
+        self.output_filename = output_filename
+        self.duration_ms = duration_ms
+        self._frames = []
+
+    def append_data(self, frame: np.ndarray):
+        self._frames.append(Image.fromarray(frame).quantize(method=Image.Quantize.FASTOCTREE))
+
+    def close(self):
+        if self._frames:
+            self._frames[0].save(self.output_filename, format='GIF', save_all=True, append_images=self._frames[1:],
+                                 duration=self.duration_ms, loop=0)
+        self._frames = []
+
+class ContactSheet:
+    def __init__(self, output_filename, format='png', quality=None):
+        """Lays the appended (height, width, 3) uint8 frames out in a near-square grid and saves it
+        as one PNG or JPEG image on close."""
+        if format not in CONTACT_SHEET_EXTENSIONS:
+            raise ValueError(f"Unknown contact sheet format {format}, expected one of {list(CONTACT_SHEET_EXTENSIONS)}.")
+        self.output_filename = output_filename
+        self.format = format
+        self.quality = DEFAULT_QUALITY[format] if quality is None else quality
+        self.last_encode_stats = {}
+
+        self._frames = []
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, frame: np.ndarray):
+        """Adds the next frame to the sheet."""
+        self._frames.append(Image.fromarray(frame))
+
+    def close(self):
+        """Saves the contact sheet."""
+        if not self._frames:
+            return
+        columns = math.ceil(math.sqrt(len(self._frames)))
+        rows = math.ceil(len(self._frames) / columns)
+        cell_width = max(frame.width for frame in self._frames)
+        cell_height = max(frame.height for frame in self._frames)
+
+        sheet = Image.new('RGB', (columns * cell_width, rows * cell_height), 'black')
+        for index, frame in enumerate(self._frames):
+            sheet.paste(frame, ((index % columns) * cell_width, (index // columns) * cell_height))
+        sheet.save(self.output_filename, format=self.format.upper(), quality=self.quality)
+
+        duration_sec = time.perf_counter() - self._start
+        self.last_encode_stats = {'format': self.format, 'frames': len(self._frames), 'seconds': duration_sec,
+                                  'bytes': os.path.getsize(self.output_filename)}
+        logger.info(f"Saved a contact sheet of {len(self._frames)} frames to {self.output_filename}")
+        self._frames = []
+
+def open_encoder(output_filename, format='gif', period_sec=2, quality=None):
+    """An AnimationEncoder for the animation formats, a ContactSheet for the image formats."""
+    if format in CONTACT_SHEET_EXTENSIONS:
+        return ContactSheet(output_filename, format, quality)
+    return AnimationEncoder(output_filename, format, period_sec, quality)
@@ -0,0 +1,112 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite and holds the per-AOI store of animation frames
+# used by the TileManager class to update animations incrementally.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Class FrameStore Methods
+#   load_grid
+#   store_grid
+#   outcome_ids
+#   add_frame
+#   frames
+#   clear
+
+from typing import Dict, Optional, List, Iterator, Tuple
+import os
+import json
+import shutil
+import hashlib
+import threading
+import logging
+from datetime import datetime
+import numpy as np
+from shapely.geometry import Polygon
+
+from .cache import aoi_hash
+
+logger = logging.getLogger(__name__)
+
+class FrameStore:
+    def __init__(self, cache_dir="databases/frame_store"):
+        """Animation frames of each AOI, keyed by capture outcome_id.
+        Every AOI keeps the grid its frames were warped onto, an index of its captures and one
+        (height, width, 3) uint8 .npy file per frame, so that only new captures have to be mosaicked."""
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def load_grid(self, aoi: Polygon) -> Optional[Dict]:
+        """The frame grid metadata of an AOI, None if it has no frames yet."""
+        return self._read_json(os.path.join(self._aoi_dir(aoi), "grid.json"))
+
+    def store_grid(self, aoi: Polygon, grid: Dict):
+        """Sets the frame grid metadata of an AOI, dropping its frames, which were made on another grid."""
+        self.clear(aoi)
+        with self._lock:
+            self._write_json(os.path.join(self._aoi_dir(aoi), "grid.json"), grid)
+
+    def outcome_ids(self, aoi: Polygon) -> List[str]:
+        """The outcome_ids of the captures with a frame in the store for an AOI."""
+        return [outcome_id for outcome_id, entry in self._load_index(aoi).items() if entry['frame'] is not None]
+
+    def add_frame(self, aoi: Polygon, outcome_id: str, capture_date: datetime, frame: np.ndarray):
+        """Stores the frame of a capture."""
+        path = self._frame_path(aoi, outcome_id)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(frame, dtype=np.uint8))
+            os.replace(tmp_path, path)  # Atomic, readers never see a partial frame.
+            self._update_index(aoi, outcome_id, {'capture_date': capture_date.isoformat(timespec='seconds'), 'frame': os.path.basename(path)})
+
+    def frames(self, aoi: Polygon, outcome_ids: Optional[List[str]] = None) -> Iterator[Tuple[datetime, np.ndarray]]:
+        """Yields (capture_date, frame) in capture date order, for the given outcome_ids or all of them.
+        Frames are memory-mapped, so only the frame being encoded is read."""
+        index = self._load_index(aoi)
+        if outcome_ids is not None:
+            wanted = set(outcome_ids)
+            index = {outcome_id: entry for outcome_id, entry in index.items() if outcome_id in wanted}
+        entries = sorted((entry for entry in index.values() if entry['frame'] is not None), key=lambda entry: entry['capture_date'])
+        for entry in entries:
+            frame = np.load(os.path.join(self._aoi_dir(aoi), "frames", entry['frame']), mmap_mode='r')
+            yield datetime.fromisoformat(entry['capture_date']), frame
+
+    def clear(self, aoi: Optional[Polygon] = None):
+        """Removes the frames of an AOI, or of every AOI."""
+        with self._lock:
+            path = self._aoi_dir(aoi) if aoi is not None else self.cache_dir
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _aoi_dir(self, aoi) -> str:
+        return os.path.join(self.cache_dir, aoi_hash(aoi))
+
+    def _frame_path(self, aoi, outcome_id) -> str:
+        return os.path.join(self._aoi_dir(aoi), "frames", f"{hashlib.sha1(outcome_id.encode()).hexdigest()}.npy")
+
+    def _load_index(self, aoi) -> Dict:
+        return self._read_json(os.path.join(self._aoi_dir(aoi), "index.json")) or {}
+
+    def _update_index(self, aoi, outcome_id, entry):
+        index = self._load_index(aoi)
+        index[outcome_id] = entry
+        self._write_json(os.path.join(self._aoi_dir(aoi), "index.json"), index)
+
+    def _read_json(self, path) -> Optional[Dict]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable frame store file {path}: {e}")
+            return None
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
@@ -5,29 +5,191 @@
 # This file is subject to the terms and conditions defined in the file 'LICENSE',
 # which is part of this source code package.
 # 
+# Class ItemRegistry Methods
+#   add
+#
+# Class ChunkPlanner Methods
+#   next_chunk
+#   split_above
+#   record
+#   split
+#   requeue
+#
 # Class Searcher Methods
 #   search_archive
+#   iter_search
+#   search_archive_async
+#   search_latest
+#   search_many
+#   search_archive_for_outcome_ids
 #   save_tiles
 
-from typing import Tuple, Dict, Optional, List, Type
-from shapely.geometry import Polygon, Point, box
+from typing import Tuple, Dict, Optional, List, Type, Iterator
+from shapely.geometry import Polygon, Point, box, shape, mapping
+import shapely
+import numpy as np
 import os
+import math
 import shutil
 import sys
 import geopandas as gpd
 from pandas.core.groupby import DataFrameGroupBy
 import pandas as pd
-from pystac import ItemCollection
-from pystac_client import Client
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from pystac import Item, ItemCollection
+from pystac_client.conformance import ConformanceClasses
+from packaging import version
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
 import logging
+import asyncio
+import threading
 import requests
 from geopy.distance import distance
+from .archive import ArchiveConnection
+from .cache import SearchCache, parse_date
+from .catalog import ASSET_ROLES, compact_catalog
 
 logger = logging.getLogger(__name__)
 tiles_gdf = None
-    
+
+# Archive collection searched for tiles.
+SEARCH_COLLECTION = "quickview-visual"
+
+
+# Fields of the STAC items used by Spotlite.  Passing these as the search 'fields' lets the archive
+# drop every other property, shrinking the responses.
+REQUIRED_FIELDS = ["type", "stac_version", "stac_extensions", "id", "collection", "geometry", "bbox",
+                   "properties.datetime", "properties.proj:epsg", "properties.grid:code",
+                   "properties.satl:outcome_id"] + [f"assets.{role}" for role in ASSET_ROLES]
+SEARCH_FIELDS = REQUIRED_FIELDS + ["properties.eo:cloud_cover", "properties.satl:valid_pixel",
+                                   "properties.satl:product_version"]
+
+# The archive's grid:code tiles follow the UTM zones, which start at -180 degrees longitude.
+UTM_ZONE_WIDTH_DEG = 6.0
+
+class ItemRegistry:
+    def __init__(self):
+        """Id-keyed registry of the items a search has returned.  Date chunks share their endpoints and AOI
+        cells overlap, so the same item can come back more than once, it is kept only the first time."""
+        self.ids = set()
+        self.num_duplicates = 0
+
+    def add(self, items) -> ItemCollection:
+        """Registers the items and returns the ones not seen before."""
+        unique = []
+        for item in items:
+            if item.id in self.ids:
+                self.num_duplicates += 1
+            else:
+                self.ids.add(item.id)
+                unique.append(item)
+        return items if len(unique) == len(items) else ItemCollection(unique)
+
+class ChunkPlanner:
+    def __init__(self, cell_chunks, merge_items=None, split_items=None, min_chunk_hours=6):
+        """Hands out the (start, end, is_cacheable) date windows of every cell as search chunks, taking the
+        cells in turn.  Without counting a window first, chunks follow the item density the cell's finished
+        chunks have shown: contiguous windows are merged while they are expected to hold at most merge_items,
+        growing at most twice as wide as the cell's last chunk, and a chunk whose first page reports more
+        than split_items is split into parts of about split_items.  None turns merging or splitting off.
+        Every chunk handed out is in plan, a dict with the 'cell' index, 'start', 'end', 'expected_items',
+        'items' and the indices of the cell's windows ('windows') it covers."""
+        self.cell_chunks = cell_chunks
+        self.merge_items = merge_items
+        self.split_items = split_items
+        self.min_chunk_hours = min_chunk_hours
+        self.plan = []
+
+        self._pending = [deque(range(len(date_chunks))) for date_chunks in cell_chunks]
+        self._items = [0] * len(cell_chunks)
+        self._hours = [0.0] * len(cell_chunks)
+        self._spans = [1] * len(cell_chunks)
+        self._next_cell = 0
+
+    def next_chunk(self) -> Optional[Dict]:
+        """The next chunk to search, None once every window has been handed out."""
+        for offset in range(len(self._pending)):
+            cell = (self._next_cell + offset) % len(self._pending)
+            if self._pending[cell]:
+                break
+        else:
+            return None
+        self._next_cell = cell + 1
+
+        date_chunks = self.cell_chunks[cell]
+        pending = self._pending[cell]
+        windows = [pending.popleft()]
+        expected_items = None
+        if self.merge_items is not None and self._hours[cell] > 0:
+            items_per_hour = self._items[cell] / self._hours[cell]
+            expected_items = items_per_hour * self._window_hours(date_chunks, windows)
+            while pending and len(windows) < 2 * self._spans[cell] and date_chunks[windows[-1]][1] == date_chunks[pending[0]][0]:
+                more_items = items_per_hour * self._window_hours(date_chunks, [pending[0]])
+                if expected_items + more_items > self.merge_items:
+                    break
+                windows.append(pending.popleft())
+                expected_items += more_items
+
+        chunk = {'cell': cell, 'start': date_chunks[windows[0]][0], 'end': date_chunks[windows[-1]][1],
+                 'expected_items': None if expected_items is None else round(expected_items), 'items': None, 'windows': windows}
+        self.plan.append(chunk)
+        return chunk
+
+    def split_above(self, chunk) -> Optional[int]:
+        """The item count above which a chunk is split rather than paged through, None if it cannot be split."""
+        if self.split_items is None or chunk.get('is_part'):
+            return None
+        duration = datetime.fromisoformat(chunk['end']) - datetime.fromisoformat(chunk['start'])
+        return self.split_items if duration >= 2 * timedelta(hours=self.min_chunk_hours) else None
+
+    def record(self, chunk, num_items):
+        """Adds the item count of a finished chunk to the density of its cell."""
+        cell = chunk['cell']
+        self._items[cell] += num_items
+        self._hours[cell] += self._chunk_hours(chunk)
+        if not chunk.get('is_part'):
+            self._spans[cell] = len(chunk['windows'])
+
+    def split(self, chunk, count) -> List[Dict]:
+        """Replaces a dense chunk in the plan by the parts to search instead.  A merged chunk gives its windows
+        back to be handed out again at the new density, a single window is split into parts of split_items."""
+        self.plan.remove(chunk)
+        self.record({**chunk, 'is_part': True}, count)
+        cell = chunk['cell']
+        self._spans[cell] = 1
+        if len(chunk['windows']) > 1:
+            self._pending[cell].extendleft(reversed(chunk['windows']))
+            return []
+
+        start = datetime.fromisoformat(chunk['start'])
+        end = datetime.fromisoformat(chunk['end'])
+        max_parts = max(1, int((end - start) / timedelta(hours=self.min_chunk_hours)))
+        num_parts = min(math.ceil(count / self.split_items), max_parts)
+        part_duration = (end - start) / num_parts
+
+        parts = []
+        for part in range(num_parts):
+            part_start = start + part * part_duration
+            part_end = end if part == num_parts - 1 else start + (part + 1) * part_duration
+            parts.append({'cell': cell, 'start': part_start.isoformat(), 'end': part_end.isoformat(),
+                          'expected_items': math.ceil(count / num_parts), 'items': None, 'windows': chunk['windows'],
+                          'is_part': True})
+        self.plan.extend(parts)
+        return parts
+
+    def requeue(self, chunk):
+        """Gives the windows of a chunk that was never searched back, they are handed out again."""
+        self.plan.remove(chunk)
+        self._pending[chunk['cell']].extendleft(reversed(chunk['windows']))
+
+    def _chunk_hours(self, chunk) -> float:
+        return (datetime.fromisoformat(chunk['end']) - datetime.fromisoformat(chunk['start'])) / timedelta(hours=1)
+
+    def _window_hours(self, date_chunks, windows) -> float:
+        return sum((datetime.fromisoformat(date_chunks[index][1]) - datetime.fromisoformat(date_chunks[index][0])) / timedelta(hours=1)
+                   for index in windows)
+
 class Searcher:
     def __init__(self, key_id="", key_secret=""):
         # Assigning default values to instance attributes
@@ -39,8 +201,30 @@ class Searcher:
         self.min_tile_coverage_percent = 0.01
         self.valid_pixel_percent_for_basemap = 100
         self.is_internal_to_satl = False
+        self.max_search_workers = 10
+        self.max_concurrent_requests = 20
+        self.search_page_size = 100
+        self.adaptive_chunking = True
+        self.target_items_per_chunk = 500
+        self.min_chunk_hours = 6
+        self.spatial_partitioning = True
+        self.spatial_cell_deg = 1.0
+        self.spatial_partition_min_cells = 4  # AOIs with a bounding box under this many cells of area are searched whole.
+        self.search_many_cluster_gap_deg = 0.05
+        self.search_many_max_cluster_deg = 0.5
+        self.outcome_id_batch_size = 50
+        self.latest_first_wave = 2
+        self.latest_min_coverage = 0.99
+        self.compact_catalog = False
+        self.last_search_stats = {}
+        self.use_search_cache = True
+        self.search_cache = SearchCache()
         self._param = None  # Initialize _param for the property
 
+        # One archive connection shared by all searches, opened on first use.
+        self._archive = None
+        self._archive_lock = threading.Lock()
+
     @property
     def param(self):
         return self._param
@@ -50,123 +234,387 @@ class Searcher:
         self._param = value
 
     # Main function to handle multi-threading based on date ranges
-    def search_archive(self, aoi: Polygon, start_date: str, end_date: str):
+    def search_archive(self, aoi: Polygon, start_date: str, end_date: str, max_cloud_cover=None, min_valid_pixel=None,
+                       min_product_version=None, fields=None):
+        """Searches the archive for the tiles of the AOI.  The optional filters and field list are
+        sent to the archive where it supports them and applied to the results otherwise."""
         search_start_timestamp = datetime.now()
 
-        # Generate date chunks
-        date_chunks = list(self._date_range_chunks(start_date, end_date))
+        all_gdfs = list(self.iter_search(aoi, start_date, end_date, max_cloud_cover, min_valid_pixel,
+                                         min_product_version, fields))
 
-        num_chunks = len(date_chunks)
+        # Check if all_gdfs is empty
+        if not all_gdfs:
+            logger.warning("No data found during search.")
+            return pd.DataFrame()  # Returning an empty DataFrame and zeros
 
-        # Container for all the results
-        all_results = []
+        # Combine all GeoDataFrames into one, the batches only counted their own tiles per grid cell.
+        tiles_gdf = pd.concat(all_gdfs, ignore_index=True)
+        tiles_gdf['image_count'] = tiles_gdf['grid:code'].map(tiles_gdf['grid:code'].value_counts())
+        tiles_gdf = self._compact(tiles_gdf)
+ 
+        search_end_timestamp = datetime.now()
+        total_search_duration = search_end_timestamp - search_start_timestamp
+        logger.warning(f"Total Search Duration: {total_search_duration}")
+
+        # Return the search results
+        return tiles_gdf
+
+    def iter_search(self, aoi: Polygon, start_date: str, end_date: str, max_cloud_cover=None, min_valid_pixel=None,
+                    min_product_version=None, fields=None) -> Iterator[gpd.GeoDataFrame]:
+        """Searches the archive and yields a GeoDataFrame for each date chunk as soon as it completes.
+        Cached chunks are yielded first.  Every batch uses the CRS of the first batch."""
+        epsg_code = None
+        registry = ItemRegistry()
+        params = self._search_params(max_cloud_cover, min_valid_pixel, fields)
+        filters = {'max_cloud_cover': max_cloud_cover, 'min_valid_pixel': min_valid_pixel,
+                   'min_product_version': min_product_version}
+
+        # Very large AOIs are split into grid cells, each searched over every date chunk.
+        cells = self._partition_aoi(aoi)
+
+        # Generate date chunks, reusing the cached ones.
+        cell_chunks = []
+        for cell in cells:
+            cached_results, date_chunks = self._load_cached_chunks(cell, start_date, end_date, params)
+            cell_chunks.append(date_chunks)
+            for items in cached_results:
+                items = self._filter_items(registry.add(items), **filters)
+                if len(items) > 0:
+                    gdf = self._setup_GDF(items, epsg_code)
+                    epsg_code = gdf.crs
+                    yield gdf
 
-        self._show_progress_bar(0, num_chunks)
         # Use ThreadPoolExecutor to run searches in parallel
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # Create a dictionary to hold futures
-            future_to_date = {
-                executor.submit(self._search_with_dates, aoi, chunk_start, chunk_end): (chunk_start, chunk_end)
-                for chunk_start, chunk_end in date_chunks
-            }
-
-            index = 0
+        executor = ThreadPoolExecutor(max_workers=self.max_search_workers)
+        try:
+            # Chunks are planned as earlier ones finish, sparse windows are merged and dense ones split.
+            planner = self._chunk_planner(cell_chunks)
+            self.last_search_stats = {'plan': planner.plan, 'cells': len(cells)}
+
+            # Track how many chunks cover each window so complete windows can be cached.
+            window_pending = [{index: 1 for index in range(len(date_chunks))} for date_chunks in cell_chunks]
+            window_results = [{index: [] for index in range(len(date_chunks))} for date_chunks in cell_chunks]
+
+            num_windows = sum(len(date_chunks) for date_chunks in cell_chunks)
+            if num_windows > 0:
+                self._show_progress_bar(0, num_windows)
+
+            # Create a dictionary to hold futures, only a worker's worth are planned ahead.
+            future_to_chunk = {}
+
+            def submit(chunk, split_above=None):
+                future = executor.submit(self._search_with_dates, cells[chunk['cell']], chunk['start'], chunk['end'], params, split_above)
+                future_to_chunk[future] = chunk
+
+            def submit_planned():
+                while len(future_to_chunk) < self.max_search_workers:
+                    chunk = planner.next_chunk()
+                    if chunk is None:
+                        break
+                    submit(chunk, planner.split_above(chunk))
+
+            submit_planned()
+            num_done = 0
             # Collect the results as they complete
-            for future in as_completed(future_to_date):
-                try:
-                    result = future.result()
+            while future_to_chunk:
+                done, _ = wait(future_to_chunk, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = future_to_chunk.pop(future)
+                    cell = chunk['cell']
+                    result = None
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        logger.error(f"Search for range {(chunk['start'], chunk['end'])} generated an exception: {exc}")
+
+                    if isinstance(result, int):
+                        # The chunk holds more items than a worker should fetch, search its parts in parallel instead.
+                        parts = planner.split(chunk, result)
+                        if parts:
+                            window_pending[cell][chunk['windows'][0]] += len(parts) - 1
+                        for part in parts:
+                            submit(part)
+                        continue
+
+                    if result is not None:
+                        planner.record(chunk, len(result))
+                    self._collect_chunk(cells[cell], chunk, result, cell_chunks[cell], window_pending[cell], window_results[cell], params)
+                    num_done += sum(1 for index in chunk['windows'] if window_pending[cell][index] == 0)
+                    self._show_progress_bar(num_done, num_windows)
+
+                    # Tiles crossing a cell edge are returned by both cells, keep the first copy.
+                    if result:
+                        result = self._filter_items(registry.add(result), **filters)
+
                     if result and len(result) > 0:
-                        all_results.append(result)  # Append each result assuming it found tiles.
-                        self._show_progress_bar(index+1, num_chunks)
-        
-                except Exception as exc:
-                    date_range = future_to_date[future]
-                    logger.error(f"Search for range {date_range} generated an exception: {exc}")
-                index += 1
-            self._show_progress_bar(num_chunks, num_chunks)
-            print()
+                        # If first time through then epsg_code is None meaning to use whatever CRS is in that tile group
+                        gdf = self._setup_GDF(result, epsg_code)
+                        epsg_code = gdf.crs #set the epsg_code to the GDF.crs for future tile groups.
+                        yield gdf
+                    else:
+                        logger.debug("No items found for a date chunk, skipping...")
+                submit_planned()
+
+            if num_windows > 0:
+                print()
+            self._log_search_plan(planner.plan)
+            self._report_failed_ranges([(chunk['start'], chunk['end']) for chunk in planner.plan if chunk['items'] is None])
+            self._report_duplicates(registry)
+        finally:
+            # Stop the outstanding searches if the caller stops iterating early.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def search_archive_async(self, aoi: Polygon, start_date: str, end_date: str, max_cloud_cover=None,
+                                   min_valid_pixel=None, min_product_version=None, fields=None):
+        """Asyncio version of search_archive returning the same GeoDataFrame.
+        Date chunks are planned like in iter_search and searched on one aiohttp session, up to
+        max_concurrent_requests at a time.  Page requests go through the archive's request scheduler,
+        which caps how many are in flight across all chunks and retries the throttled ones."""
+        search_start_timestamp = datetime.now()
+        params = self._search_params(max_cloud_cover, min_valid_pixel, fields)
+
+        # Generate date chunks, reusing the cached ones.
+        all_results = []
+        cells = self._partition_aoi(aoi)
+        cell_chunks = []
+        for cell in cells:
+            cached_results, date_chunks = self._load_cached_chunks(cell, start_date, end_date, params)
+            all_results.extend(cached_results)
+            cell_chunks.append(date_chunks)
+
+        planner = self._chunk_planner(cell_chunks)
+        self.last_search_stats = {'plan': planner.plan, 'cells': len(cells)}
+        window_pending = [{index: 1 for index in range(len(date_chunks))} for date_chunks in cell_chunks]
+        window_results = [{index: [] for index in range(len(date_chunks))} for date_chunks in cell_chunks]
+
+        async with self.archive.open_async_session() as session:
+            task_to_chunk = {}
+
+            def submit(chunk, split_above=None):
+                task = asyncio.ensure_future(self._search_with_dates_async(session, cells[chunk['cell']], chunk['start'],
+                                                                           chunk['end'], params, split_above))
+                task_to_chunk[task] = chunk
+
+            def submit_planned():
+                while len(task_to_chunk) < self.max_concurrent_requests:
+                    chunk = planner.next_chunk()
+                    if chunk is None:
+                        break
+                    submit(chunk, planner.split_above(chunk))
+
+            submit_planned()
+            while task_to_chunk:
+                done, _ = await asyncio.wait(task_to_chunk, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    chunk = task_to_chunk.pop(task)
+                    cell = chunk['cell']
+                    result = task.result()
+                    if isinstance(result, int):
+                        logger.debug(f"Splitting period {chunk['start']} to {chunk['end']} with {result} items.")
+                        parts = planner.split(chunk, result)
+                        if parts:
+                            window_pending[cell][chunk['windows'][0]] += len(parts) - 1
+                        for part in parts:
+                            submit(part)
+                        continue
+
+                    if result is not None:
+                        planner.record(chunk, len(result))
+                    self._collect_chunk(cells[cell], chunk, result, cell_chunks[cell], window_pending[cell], window_results[cell], params)
+                    if result and len(result) > 0:
+                        all_results.append(result)
+                submit_planned()
+
+        self._log_search_plan(planner.plan)
+        self._report_failed_ranges([(chunk['start'], chunk['end']) for chunk in planner.plan if chunk['items'] is None])
 
         all_gdfs = []
         epsg_code = None
-
-        logger.info(f"Processing {len(all_results)} num of items groups")
+        registry = ItemRegistry()
         for items in all_results:
-            if items and len(items) > 0:
-                # If first time through then epsg_code is None meaning to use whatever CRS is in that tile group
-                gdf = self._setup_GDF(items, epsg_code) 
-                all_gdfs.append(gdf)
-                epsg_code = gdf.crs #set the epsg_code to the GDF.crs for future tile groups.
-                # logger.info(f"Using EPSG:{epsg_code} for all tiles.")
-            else:
-                # Option 1: Log the absence of data
-                logger.debug("No items found for a date chunk, skipping...")
-        
-        # Check if all_gdfs is empty
+            items = self._filter_items(registry.add(items), max_cloud_cover, min_valid_pixel,
+                                       min_product_version)
+            if len(items) == 0:
+                continue
+            # If first time through then epsg_code is None meaning to use whatever CRS is in that tile group
+            gdf = self._setup_GDF(items, epsg_code)
+            all_gdfs.append(gdf)
+            epsg_code = gdf.crs
+
+        self._report_duplicates(registry)
         if not all_gdfs:
             logger.warning("No data found during search.")
-            return pd.DataFrame()  # Returning an empty DataFrame and zeros
+            return pd.DataFrame()
 
-        # Combine all GeoDataFrames into one
         tiles_gdf = pd.concat(all_gdfs, ignore_index=True)
- 
-        search_end_timestamp = datetime.now()
-        total_search_duration = search_end_timestamp - search_start_timestamp
-        logger.warning(f"Total Search Duration: {total_search_duration}")
+        tiles_gdf['image_count'] = tiles_gdf['grid:code'].map(tiles_gdf['grid:code'].value_counts())
+        tiles_gdf = self._compact(tiles_gdf)
+        logger.warning(f"Total Search Duration: {datetime.now() - search_start_timestamp}")
+        return tiles_gdf
 
-        # Return the search results
+    def search_latest(self, aoi: Polygon, start_date: str, end_date: str, tiles_per_grid=1, max_captures=None,
+                      max_cloud_cover=None, min_valid_pixel=None, min_product_version=None, fields=None):
+        """Searches newest-first for the latest tiles_per_grid qualifying tiles of every grid cell.
+        Date windows are searched backwards in waves and the search stops once every grid cell seen has
+        enough tiles and together they cover the AOI, or once max_captures captures were found.
+        Returns the latest tiles of each grid cell, or an empty DataFrame if none were found."""
+        search_start_timestamp = datetime.now()
+        params = self._search_params(max_cloud_cover, min_valid_pixel, fields)
+        filters = {'max_cloud_cover': max_cloud_cover, 'min_valid_pixel': min_valid_pixel,
+                   'min_product_version': min_product_version}
+
+        if self.use_search_cache:
+            windows = self.search_cache.windows(start_date, end_date)
+        else:
+            windows = [(chunk_start, chunk_end, False) for chunk_start, chunk_end in self._date_range_chunks(start_date, end_date)]
+        windows.reverse()
+
+        all_gdfs = []
+        epsg_code = None
+        registry = ItemRegistry()
+        grid_counts = {}
+        grid_footprints = {}
+        outcome_ids = set()
+        failed_ranges = []
+        num_searched = 0
+        wave_size = self.latest_first_wave
+        is_complete = False
+
+        with ThreadPoolExecutor(max_workers=self.max_search_workers) as executor:
+            while num_searched < len(windows) and not is_complete:
+                wave = windows[num_searched:num_searched + wave_size]
+                num_searched += len(wave)
+                # Start small, most AOIs are covered by the first few windows, and grow the waves after that.
+                wave_size = min(wave_size * 2, self.max_search_workers)
+
+                results = list(executor.map(lambda window: self._search_window(aoi, *window, params), wave))
+                for (chunk_start, chunk_end, _), result in zip(wave, results):
+                    if result is None:
+                        failed_ranges.append((chunk_start, chunk_end))
+                        continue
+                    result = self._filter_items(registry.add(result), **filters)
+                    if len(result) == 0:
+                        continue
+
+                    gdf = self._setup_GDF(result, epsg_code)
+                    epsg_code = gdf.crs
+                    all_gdfs.append(gdf)
+                    outcome_ids.update(gdf['outcome_id'])
+                    for grid_code, geometry in zip(gdf['grid:code'], gdf.geometry):
+                        grid_counts[grid_code] = grid_counts.get(grid_code, 0) + 1
+                        grid_footprints.setdefault(grid_code, geometry)
+
+                if max_captures is not None and len(outcome_ids) >= max_captures:
+                    logger.info(f"Latest search reached {len(outcome_ids)} captures.")
+                    is_complete = True
+                elif grid_counts and min(grid_counts.values()) >= tiles_per_grid:
+                    is_complete = self._covers_aoi(aoi, grid_footprints.values())
+
+        self.last_search_stats = {'windows_searched': num_searched, 'windows_total': len(windows),
+                                  'stopped_early': num_searched < len(windows)}
+        self._report_failed_ranges(failed_ranges)
+        self._report_duplicates(registry)
+        logger.info(f"Latest search touched {num_searched} of {len(windows)} date windows.")
+
+        if not all_gdfs:
+            logger.warning("No data found during search.")
+            return pd.DataFrame()
+
+        tiles_gdf = pd.concat(all_gdfs, ignore_index=True).sort_values(by='capture_date', ascending=False)
+        if max_captures is not None:
+            latest_outcome_ids = tiles_gdf['outcome_id'].drop_duplicates().head(max_captures)
+            tiles_gdf = tiles_gdf[tiles_gdf['outcome_id'].isin(latest_outcome_ids)]
+        tiles_gdf = tiles_gdf.groupby('grid:code', sort=False).head(tiles_per_grid).reset_index(drop=True)
+        tiles_gdf['image_count'] = tiles_gdf['grid:code'].map(tiles_gdf['grid:code'].value_counts())
+        tiles_gdf = self._compact(tiles_gdf)
+
+        logger.warning(f"Total Search Duration: {datetime.now() - search_start_timestamp}")
         return tiles_gdf
 
-    def search_archive_for_outcome_id(self, outcome_id: str):
-        try:
-            # Connect To The Archive
-            archive = self._connect_to_archive()
-            logger.debug("Connected To Archive")
+    def search_many(self, aois: List[Polygon], start_date: str, end_date: str, max_cloud_cover=None, min_valid_pixel=None,
+                    min_product_version=None, fields=None) -> Dict[int, gpd.GeoDataFrame]:
+        """Searches many AOIs with one archive search per cluster of nearby AOIs.
+        Each cluster's envelope is searched once and the tiles are assigned back to the AOIs they
+        intersect.  Returns a dict from AOI index to its tiles, an empty DataFrame if none were found."""
+        results = {}
+        clusters = self._cluster_aois(aois)
+        logger.info(f"Searching {len(aois)} AOIs in {len(clusters)} clusters.")
 
-            if not archive:
-                logger.error("Failed to connect to archive.")
-                return None
+        for cluster_number, cluster in enumerate(clusters):
+            cluster_aois = [aois[index] for index in cluster]
+            search_aoi = cluster_aois[0] if len(cluster) == 1 else box(*shapely.total_bounds(cluster_aois))
+            logger.info(f"Searching cluster {cluster_number + 1}/{len(clusters)} with {len(cluster)} AOIs.")
+            tiles_gdf = self.search_archive(search_aoi, start_date, end_date, max_cloud_cover, min_valid_pixel,
+                                            min_product_version, fields)
 
-            items = archive.search(
-                collections=["quickview-visual"],
-                query={"satl:outcome_id": {"eq":outcome_id}},
-            ).item_collection()
+            if tiles_gdf.empty:
+                results.update({index: pd.DataFrame() for index in cluster})
+                continue
 
-            if items is None or len(items) == 0:
-                logger.debug(f"No results returned for Outcome_ID: {outcome_id}")
-                return None
+            # Spatial join of the cluster's AOIs against the tiles in one STRtree query.
+            tree = shapely.STRtree(tiles_gdf.geometry.values)
+            aoi_positions, tile_positions = tree.query(np.asarray(cluster_aois, dtype=object), predicate='intersects')
+            for position, index in enumerate(cluster):
+                aoi_tiles = tiles_gdf.iloc[np.sort(tile_positions[aoi_positions == position])]
+                if aoi_tiles.empty:
+                    results[index] = pd.DataFrame()
+                    continue
+                aoi_tiles = aoi_tiles.reset_index(drop=True)
+                aoi_tiles['image_count'] = aoi_tiles['grid:code'].map(aoi_tiles['grid:code'].value_counts())
+                results[index] = aoi_tiles
 
-            if not isinstance(items, ItemCollection):  
-                logger.error(f"Unexpected type returned: {type(items)}")
-                return None
+        return results
 
-            logger.debug(f"Num Tiles Found: {len(items)}")
+    def search_archive_for_outcome_id(self, outcome_id: str):
+        return self.search_archive_for_outcome_ids([outcome_id])
 
-            tiles_gdf = self._setup_GDF(items) 
-            return tiles_gdf
+    def search_archive_for_outcome_ids(self, outcome_ids: List[str]):
+        """Searches the tiles of many captures with batched 'in' queries run in parallel.
+        Returns one GeoDataFrame sorted by outcome_id and capture_date, or None if nothing was found."""
+        outcome_ids = list(dict.fromkeys(outcome_ids))
+        batches = [outcome_ids[start:start + self.outcome_id_batch_size]
+                   for start in range(0, len(outcome_ids), self.outcome_id_batch_size)]
 
-        except Exception as e:
-            logger.error(f"Error during search for Outcome_ID: {outcome_id}: {e}")
+        with ThreadPoolExecutor(max_workers=self.max_search_workers) as executor:
+            results = list(executor.map(self._search_with_outcome_ids, batches))
+
+        failed_ids = [outcome_id for batch, result in zip(batches, results) if result is None for outcome_id in batch]
+        if failed_ids:
+            logger.error(f"Search incomplete, {len(failed_ids)} outcome ids failed after retries: {failed_ids}")
+
+        registry = ItemRegistry()
+        items = [item for result in results if result for item in registry.add(result)]
+        self.last_search_stats = {}
+        self._report_duplicates(registry)
+        if len(items) == 0:
+            logger.debug(f"No results returned for Outcome_IDs: {outcome_ids}")
             return None
-        
+
+        logger.debug(f"Num Tiles Found: {len(items)} for {len(outcome_ids)} Outcome_IDs")
+        tiles_gdf = self._setup_GDF(ItemCollection(items))
+        return self._compact(tiles_gdf.sort_values(by=['outcome_id', 'capture_date'], kind='stable').reset_index(drop=True))
+
+    @property
+    def archive(self) -> ArchiveConnection:
+        """The shared archive connection, re-created if the endpoint or credentials change."""
+        with self._archive_lock:
+            if self._archive is None or not self._archive.matches(self.stac_api_url, self.key_id, self.key_secret):
+                if self._archive is not None:
+                    self._archive.close()
+                self._archive = ArchiveConnection(self.stac_api_url, self.key_id, self.key_secret,
+                                                  pool_size=max(self.max_search_workers, self.max_concurrent_requests))
+            return self._archive
+
     def _connect_to_archive(self):
         try:
-            
-            API_KEY_ID = self.key_id
-            API_KEY_SECRET = self.key_secret
-            STAC_API_URL = self.stac_api_url
-            headers = {"authorizationToken": f"Key,Secret {API_KEY_ID},{API_KEY_SECRET}"}
-            
-            logging.debug("Using Credentials Archive Access with headers: %s", headers)
-            archive = Client.open(STAC_API_URL, headers=headers)
-            # Test connection
-            response = requests.get(STAC_API_URL, headers=headers)
-            response.raise_for_status()  # Will raise an HTTPError if the HTTP request returned an unsuccessful status code
-            logging.debug("Connection test successful with status code %s", response.status_code)
-
-            # Print out the available collections.
-            for collection in archive.get_all_collections():
-                logging.debug(f"Collection ID: {collection.id}, Title: {collection.title}")
-            return archive
+            archive = self.archive
+            client = archive.client
+
+            # Listing the collections is only useful for debugging, and is cached by the connection.
+            if logger.isEnabledFor(logging.DEBUG):
+                archive.get_collections()
+            return client
 
         except requests.exceptions.HTTPError as http_err:
             logging.error("HTTP error occurred: %s", http_err)
@@ -175,6 +623,222 @@ class Searcher:
             logging.error("Error occurred while connecting to archive: %s", e)
             return None
 
+    def _load_cached_chunks(self, aoi, start_date, end_date, params=None):
+        """Splits the date range into chunks and loads the ones already in the search cache.
+        Returns the cached item collections and the (start, end, is_cacheable) chunks still to be searched."""
+        if not self.use_search_cache:
+            return [], [(chunk_start, chunk_end, False) for chunk_start, chunk_end in self._date_range_chunks(start_date, end_date)]
+
+        cached_results = []
+        date_chunks = []
+        windows = self.search_cache.windows(start_date, end_date)
+        for chunk_start, chunk_end, is_cacheable in windows:
+            items = self.search_cache.load(aoi, SEARCH_COLLECTION, chunk_start, chunk_end, params) if is_cacheable else None
+            if items is None:
+                date_chunks.append((chunk_start, chunk_end, is_cacheable))
+            elif len(items) > 0:
+                cached_results.append(items)
+
+        logger.info(f"Search cache: {len(windows) - len(date_chunks)} date chunks cached, {len(date_chunks)} to search.")
+        return cached_results, date_chunks
+
+    def _chunk_planner(self, cell_chunks) -> ChunkPlanner:
+        """Merging stops at a page's worth of items, larger chunks would need more requests anyway."""
+        if not self.adaptive_chunking:
+            return ChunkPlanner(cell_chunks)
+        return ChunkPlanner(cell_chunks, merge_items=min(self.target_items_per_chunk, self.search_page_size),
+                            split_items=self.target_items_per_chunk, min_chunk_hours=self.min_chunk_hours)
+
+    def _partition_aoi(self, aoi: Polygon) -> List[Polygon]:
+        """Splits a very large AOI into the cells of a fixed global grid, smaller AOIs are returned whole.
+        Cells are aligned to the UTM zones the archive's grid:code tiles are laid out in, so a cell never
+        straddles two zones and overlapping searches reuse the same cells and search cache entries."""
+        if not self.spatial_partitioning:
+            return [aoi]
+
+        cell_deg = self._spatial_cell_deg()
+        minx, miny, maxx, maxy = aoi.bounds
+        # Gate on the AOI's size, not the number of cells it touches, a small AOI on a cell corner touches four.
+        if (maxx - minx) * (maxy - miny) < self.spatial_partition_min_cells * cell_deg ** 2:
+            return [aoi]
+
+        cols = range(math.floor((minx + 180) / cell_deg), math.ceil((maxx + 180) / cell_deg))
+        rows = range(math.floor((miny + 90) / cell_deg), math.ceil((maxy + 90) / cell_deg))
+
+        boxes = np.array([box(-180 + col * cell_deg, -90 + row * cell_deg, -180 + (col + 1) * cell_deg, -90 + (row + 1) * cell_deg)
+                          for row in rows for col in cols])
+        cells = shapely.intersection(boxes, aoi)
+        areas = shapely.area(cells)
+
+        # A plain rectangle is the cheapest query for the archive, use it where the AOI covers the whole cell.
+        cells = np.where(areas >= 0.999 * shapely.area(boxes), boxes, cells)
+        cells = list(cells[areas > 0])
+        logger.info(f"Partitioned AOI into {len(cells)} cells of {cell_deg} degrees.")
+        return cells
+
+    def _spatial_cell_deg(self) -> float:
+        """The cell size snapped to divide, or be a multiple of, the UTM zone width."""
+        if self.spatial_cell_deg >= UTM_ZONE_WIDTH_DEG:
+            return UTM_ZONE_WIDTH_DEG * round(self.spatial_cell_deg / UTM_ZONE_WIDTH_DEG)
+        return UTM_ZONE_WIDTH_DEG / round(UTM_ZONE_WIDTH_DEG / self.spatial_cell_deg)
+
+    def _cluster_aois(self, aois: List[Polygon]) -> List[List[int]]:
+        """Groups the indices of AOIs lying within search_many_cluster_gap_deg of each other.
+        Clusters whose envelope would be wider than search_many_max_cluster_deg are split on a grid of that
+        size, so a chain of AOIs never turns into one huge, mostly empty search."""
+        geometries = np.asarray(aois, dtype=object)
+        tree = shapely.STRtree(geometries)
+        left, right = tree.query(shapely.buffer(shapely.envelope(geometries), self.search_many_cluster_gap_deg),
+                                 predicate='intersects')
+
+        # Connected components of the "is near" graph.
+        parents = list(range(len(aois)))
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+        for a, b in zip(left, right):
+            parents[find(a)] = find(b)
+
+        components = {}
+        for index in range(len(aois)):
+            components.setdefault(find(index), []).append(index)
+
+        clusters = []
+        max_size = self.search_many_max_cluster_deg
+        for component in components.values():
+            minx, miny, maxx, maxy = shapely.total_bounds(geometries[component])
+            if max(maxx - minx, maxy - miny) <= max_size:
+                clusters.append(component)
+                continue
+            cells = {}
+            for index in component:
+                centroid = aois[index].centroid
+                cells.setdefault((math.floor(centroid.x / max_size), math.floor(centroid.y / max_size)), []).append(index)
+            clusters.extend(cells.values())
+
+        return clusters
+
+    def _search_params(self, max_cloud_cover=None, min_valid_pixel=None, fields=None) -> Dict:
+        """Builds the STAC 'query' and 'fields' search parameters, for the extensions the archive supports.
+        The product version is always checked client-side, versions do not compare correctly as strings."""
+        query = {}
+        if max_cloud_cover is not None:
+            query['eo:cloud_cover'] = {'lte': max_cloud_cover}
+        if min_valid_pixel is not None:
+            query['satl:valid_pixel'] = {'gte': min_valid_pixel}
+        if not query and not fields:
+            return {}
+
+        params = {}
+        client = self._connect_to_archive()
+        if query:
+            if self._archive_conforms_to(client, ConformanceClasses.QUERY):
+                params['query'] = query
+            else:
+                logger.info("Archive does not support the query extension, filtering tiles client-side.")
+        if fields:
+            if self._archive_conforms_to(client, ConformanceClasses.FIELDS):
+                params['fields'] = {'include': list(dict.fromkeys(REQUIRED_FIELDS + list(fields))), 'exclude': []}
+            else:
+                logger.info("Archive does not support the fields extension, fetching full items.")
+        return params
+
+    def _archive_conforms_to(self, client, conformance_class) -> bool:
+        try:
+            return client is not None and client.conforms_to(conformance_class)
+        except Exception as e:
+            logger.debug(f"Could not check archive conformance to {conformance_class.name}: {e}")
+            return False
+
+    def _filter_items(self, items, max_cloud_cover=None, min_valid_pixel=None, min_product_version=None) -> ItemCollection:
+        """Applies the search filters client-side, for archives and cached results that did not apply them."""
+        if max_cloud_cover is None and min_valid_pixel is None and min_product_version is None:
+            return items
+
+        min_version = version.parse(min_product_version) if min_product_version is not None else None
+        kept = []
+        for item in items:
+            properties = item.properties
+            cloud_cover = properties.get('eo:cloud_cover')
+            valid_pixel = properties.get('satl:valid_pixel')
+            product_version = properties.get('satl:product_version')
+            if max_cloud_cover is not None and (cloud_cover is None or cloud_cover > max_cloud_cover):
+                continue
+            if min_valid_pixel is not None and (valid_pixel is None or valid_pixel < min_valid_pixel):
+                continue
+            if min_version is not None and (product_version is None or version.parse(product_version) < min_version):
+                continue
+            kept.append(item)
+        return items if len(kept) == len(items) else ItemCollection(kept)
+
+    def _search_window(self, aoi, start_date, end_date, is_cacheable, params=None):
+        """Searches one date window, reading and filling the search cache when the window is cacheable."""
+        if is_cacheable:
+            items = self.search_cache.load(aoi, SEARCH_COLLECTION, start_date, end_date, params)
+            if items is not None:
+                return items
+
+        items = self._search_with_dates(aoi, start_date, end_date, params)
+        if items is not None and is_cacheable:
+            self.search_cache.store(aoi, SEARCH_COLLECTION, start_date, end_date, items, params)
+        return items
+
+    def _covers_aoi(self, aoi, footprints) -> bool:
+        """True if the footprints cover the AOI, up to latest_min_coverage of its area."""
+        covered = shapely.union_all(list(footprints)).intersection(aoi)
+        return covered.area >= self.latest_min_coverage * aoi.area
+
+    def _collect_chunk(self, aoi, chunk, result, date_chunks, window_pending, window_results, params=None):
+        """Records a finished chunk and caches every date chunk whose searches are now all complete.
+        A None result marks the chunk as failed, so the date chunks it covers are not cached."""
+        chunk['items'] = len(result) if result is not None else None
+        for index in chunk['windows']:
+            chunk_start, chunk_end, is_cacheable = date_chunks[index]
+            window_pending[index] -= 1
+            # Only cacheable windows hold on to their results, until they are written.
+            if result is None or not is_cacheable:
+                window_results[index] = None
+            elif window_results[index] is not None:
+                window_results[index].append(result)
+
+            if window_pending[index] == 0 and window_results[index] is not None:
+                items = self._items_in_range(window_results[index], chunk_start, chunk_end)
+                self.search_cache.store(aoi, SEARCH_COLLECTION, chunk_start, chunk_end, items, params)
+                window_results[index] = None
+
+    def _items_in_range(self, results, start_date, end_date) -> ItemCollection:
+        """Collects the unique items of the results captured within the date range."""
+        start = parse_date(start_date)
+        end = parse_date(end_date)
+        items = {}
+        for result in results:
+            for item in result:
+                capture_date = item.datetime.astimezone(timezone.utc).replace(tzinfo=None)
+                if start <= capture_date <= end:
+                    items[item.id] = item
+        return ItemCollection(list(items.values()))
+
+    def _report_failed_ranges(self, failed_ranges):
+        """Records the date ranges that still failed after retries, so an incomplete search is never silent."""
+        failed_ranges = list(dict.fromkeys(failed_ranges))  # A range fails once per cell.
+        self.last_search_stats['failed_ranges'] = failed_ranges
+        if failed_ranges:
+            logger.error(f"Search incomplete, {len(failed_ranges)} date ranges failed after retries: {failed_ranges}")
+
+    def _report_duplicates(self, registry):
+        self.last_search_stats['duplicates_dropped'] = registry.num_duplicates
+        if registry.num_duplicates:
+            logger.info(f"Dropped {registry.num_duplicates} duplicate items returned by overlapping searches.")
+
+    def _log_search_plan(self, plan):
+        num_windows = len({(chunk['cell'], index) for chunk in plan for index in chunk['windows']})
+        logger.info(f"Search plan: {len(plan)} chunks for {num_windows} date windows.")
+        for chunk in plan:
+            logger.info(f"  cell {chunk['cell']} {chunk['start']} - {chunk['end']}: "
+                        f"expected {chunk['expected_items']}, found {chunk['items']}")
+
     # Function to split the date range into two-week chunks
     def _date_range_chunks(self, start_date: str, end_date: str, chunk_size_days=30):
         start = datetime.fromisoformat(start_date)
@@ -187,7 +851,9 @@ class Searcher:
             start = chunk_end
 
     # Modified search function to accept start and end dates
-    def _search_with_dates(self, aoi, start_date, end_date):
+    def _search_with_dates(self, aoi, start_date, end_date, params=None, split_above=None):
+        """Searches the AOI over a date range.  Returns the items, None on failure, or with split_above the
+        number of matching items when the first page reports more than that, so the caller can split the range."""
         start_timestamp = datetime.now()
         try:
             # Connect To The Archive
@@ -201,11 +867,10 @@ class Searcher:
                 logger.error("Failed to connect to archive.")
                 return None
             logger.debug(f"Start-End: {start_date}-{end_date}")
-            items = archive.search(
-                intersects=aoi,
-                collections=["quickview-visual"],
-                datetime=f"{start_date}/{end_date}",
-            ).item_collection()
+            items = self._fetch_items(self._search_body(aoi, start_date, end_date, params), split_above)
+            if isinstance(items, int):
+                logger.debug(f"Splitting period {start_date} to {end_date} with {items} items.")
+                return items
 
             logger.debug(f"Search Complete for period: {start_date} to {end_date}!")
             search_done_now = datetime.now()
@@ -219,8 +884,9 @@ class Searcher:
                 return None
 
             if len(items) == 0:
+                # An empty collection (rather than None) lets the caller tell an empty period from a failed search.
                 logger.debug(f"Search returned an empty collection for period: {start_date} to {end_date}")
-                return None
+                return items
             logger.debug(f"Num Tiles Found: {len(items)}")
 
             return items
@@ -229,6 +895,104 @@ class Searcher:
             logger.error(f"Error during search for period: {start_date} to {end_date}: {e}")
             return None
 
+    def _search_with_outcome_ids(self, outcome_ids):
+        """Searches one batch of outcome ids, following the result pages.  Returns None on failure."""
+        try:
+            archive = self._connect_to_archive()
+            if not archive:
+                logger.error("Failed to connect to archive.")
+                return None
+
+            items = self._fetch_items({
+                "collections": [SEARCH_COLLECTION],
+                "query": {"satl:outcome_id": {"in": outcome_ids}},
+                "limit": self.search_page_size,
+            })
+
+            if not isinstance(items, ItemCollection):
+                logger.error(f"Unexpected type returned: {type(items)}")
+                return None
+            return items
+
+        except Exception as e:
+            logger.error(f"Error during search for Outcome_IDs: {outcome_ids}: {e}")
+            return None
+
+    def _search_body(self, aoi, start_date, end_date, params=None) -> Dict:
+        """The POST body of an archive search of the AOI over a date range."""
+        return {
+            "intersects": mapping(aoi),
+            "collections": [SEARCH_COLLECTION],
+            "datetime": f"{self._rfc3339(start_date)}/{self._rfc3339(end_date)}",
+            "limit": self.search_page_size,
+            **(params or {}),
+        }
+
+    def _fetch_items(self, body, split_above=None):
+        """Fetches every page of a search, following the STAC 'next' links.  Each page goes through the
+        archive's scheduler, so a throttled page is retried on its own and counts as one request.
+        With split_above, a first page that is not the last and reports more matching items than that
+        stops the search and its item count is returned instead."""
+        archive = self.archive
+        request = {'href': archive.search_url, 'method': 'POST', 'body': body}
+        features = []
+        while request is not None:
+            page = archive.scheduler.call(archive.fetch_page, request)
+            next_request = archive.next_page_request(page, request)
+            count = self._dense_count(page, split_above) if not features and next_request is not None else None
+            if count is not None:
+                return count
+            features.extend(page.get('features', []))
+            request = next_request
+        return self._item_collection(features)
+
+    async def _fetch_items_async(self, session, search_url, body, split_above=None):
+        """Async _fetch_items, the pages are fetched on an aiohttp session."""
+        archive = self.archive
+        request = {'href': search_url, 'method': 'POST', 'body': body}
+        features = []
+        while request is not None:
+            page = await archive.scheduler.call_async(archive.fetch_page_async, session, request)
+            next_request = archive.next_page_request(page, request)
+            count = self._dense_count(page, split_above) if not features and next_request is not None else None
+            if count is not None:
+                return count
+            features.extend(page.get('features', []))
+            request = next_request
+        return self._item_collection(features)
+
+    def _item_collection(self, features) -> ItemCollection:
+        # The features were just parsed from the response, so they are neither copied nor cloned.
+        return ItemCollection([Item.from_dict(feature, preserve_dict=False) for feature in features], clone_items=False)
+
+    def _dense_count(self, page, split_above) -> Optional[int]:
+        """The number of items matched by a search whose first page is this one, if more than split_above."""
+        if split_above is None:
+            return None
+        matched = page.get('numberMatched', page.get('context', {}).get('matched'))
+        return matched if matched is not None and matched > split_above else None
+
+    async def _search_with_dates_async(self, session, aoi, start_date, end_date, params=None, split_above=None):
+        """Async _search_with_dates."""
+        try:
+            # The landing page is read once per connection, off the event loop.
+            search_url = await asyncio.to_thread(lambda: self.archive.search_url)
+            items = await self._fetch_items_async(session, search_url, self._search_body(aoi, start_date, end_date, params), split_above)
+        except Exception as e:
+            logger.error(f"Error during search for period: {start_date} to {end_date}: {e}")
+            return None
+
+        if isinstance(items, int):
+            return items
+        logger.debug(f"Num Tiles Found: {len(items)} for period: {start_date} to {end_date}")
+        return items
+
+    def _rfc3339(self, date_str: str) -> str:
+        return f"{parse_date(date_str).isoformat()}Z"
+
+    def _compact(self, tiles_gdf):
+        return compact_catalog(tiles_gdf) if self.compact_catalog else tiles_gdf
+
     def _show_progress_bar(self, iteration, total, bar_length=50):
         progress = float(iteration) / float(total)
         arrow = '-' * int(round(progress * bar_length) - 1)
@@ -242,58 +1006,43 @@ class Searcher:
         if items is None or len(items) == 0:
             logger.error("Error: Trying To Group Empty Items!")
             return False
-            
-        # Check for the first item and its properties
-        first_item = next(iter(items), None)
-        if first_item is not None:
-            first_epsg_code_number = first_item.properties.get('proj:epsg', None)
-            first_epsg_code = f"epsg:{first_epsg_code_number}"
+
+        # Pull the columns out of the whole ItemCollection in one pass rather than building a frame per item.
+        ids, capture_dates, geometries, properties = [], [], [], []
+        asset_hrefs = {role: [] for role in ASSET_ROLES}
+        for item in items:
+            ids.append(item.id)
+            capture_dates.append(item.datetime)
+            geometries.append(shape(item.geometry) if item.geometry else None)
+            properties.append(item.properties)
+            for role in ASSET_ROLES:
+                asset = item.assets.get(role)
+                asset_hrefs[role].append(asset.href if asset is not None else None)
+
+        # If the epsg_code_input is set use it, otherwise use the code of the first tile.
+        if epsg_code_input is not None:
+            target_crs = epsg_code_input
         else:
-            print("The collection is empty.")
-            return False
+            target_crs = f"epsg:{properties[0].get('proj:epsg', None)}"
 
-        gdfs = []
+        # Make the geometries valid with a single vectorized pass, only touching the invalid ones.
+        geometry_array = np.asarray(geometries, dtype=object)
+        invalid = ~shapely.is_valid(geometry_array) & ~shapely.is_missing(geometry_array)
+        geometry_array[invalid] = shapely.buffer(geometry_array[invalid], 0)
 
-        # Convert the ItemCollection to a dictionary array and make sure the CRS is handled for all tiles.
+        properties_df = pd.DataFrame.from_records(properties)
+        columns = ['geometry'] + list(properties_df.columns)
+        combined_gdf = gpd.GeoDataFrame(properties_df, geometry=gpd.GeoSeries(geometry_array), crs=f"{target_crs}")[columns]
 
-        for item in items:
-            epsg_code_number = item.properties.get('proj:epsg', None)
-            epsg_code = f"epsg:{epsg_code_number}"
-            
-            if not epsg_code:
-                logger.warning("'proj:epsg' not found in item's properties.")
-                continue
+        combined_gdf['id'] = ids
+        combined_gdf['capture_date'] = pd.to_datetime(pd.Series(capture_dates), utc=True).dt.tz_localize(None)
+        combined_gdf['data_age'] = (datetime.utcnow() - combined_gdf['capture_date']).dt.days  # Using utcnow
+        for role in ASSET_ROLES:
+            combined_gdf[f'{role}_url'] = asset_hrefs[role]
+        combined_gdf['outcome_id'] = properties_df.get('satl:outcome_id')
+        combined_gdf['valid_pixel_percent'] = properties_df.get('satl:valid_pixel')
 
-            # if the epsg_code_input is set we should use it as the code otherwise use standard code WGS84.
-            if epsg_code_input is not None: # If a epsg code is provided as an arg
-                target_crs = epsg_code_input
-            else:
-                target_crs = first_epsg_code
-
-            feature = item.to_dict()
-            gdf = gpd.GeoDataFrame.from_features([feature], crs=f"{target_crs}")
-
-            gdf['id'] = item.id
-            gdf['capture_date'] = pd.to_datetime(item.datetime)
-            gdf['capture_date'] = gdf['capture_date'].dt.tz_localize(None)
-            gdf['geometry'] = gdf['geometry'].apply(lambda x: x.buffer(0))
-            gdf['data_age'] = (datetime.utcnow() - gdf['capture_date']).dt.days  # Using utcnow
-            gdf['preview_url'] = item.assets["preview"].href
-            gdf['thumbnail_url'] = item.assets["thumbnail"].href
-            gdf['analytic_url'] = item.assets["analytic"].href
-            gdf['outcome_id'] = item.properties['satl:outcome_id']
-            gdf['valid_pixel_percent'] = item.properties['satl:valid_pixel']
-            
-            gdfs.append(gdf)
-
-        # Combine all reprojected GeoDataFrames
-        combined_gdf = pd.concat(gdfs, ignore_index=True)
-
-        # Count the number of tiles in each 'grid:code'
-        tile_counts = combined_gdf['grid:code'].value_counts().reset_index()
-        tile_counts.columns = ['grid:code', 'image_count']
-
-        # Join this back to the original GeoDataFrame
-        combined_gdf = pd.merge(combined_gdf, tile_counts, on='grid:code', how='left')
-        
-        return combined_gdf
\ No newline at end of file
+        # Count the number of tiles in each 'grid:code' and join it back to the tiles.
+        combined_gdf['image_count'] = combined_gdf['grid:code'].map(combined_gdf['grid:code'].value_counts())
+
+        return combined_gdf
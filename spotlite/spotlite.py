@@ -9,16 +9,19 @@
 
 from typing import Tuple, Dict, Optional, List, Type
 from shapely.geometry import Polygon, Point, box
+from shapely.ops import unary_union
 import webbrowser
 from datetime import datetime
 from pathlib import Path
 import geopandas as gpd
+import pandas as pd
 from pandas.core.groupby import DataFrameGroupBy
 from datetime import datetime, timedelta
 import logging
 from PIL import ImageFont
 
 from .tile import TileManager
+from .search import SEARCH_FIELDS
 from .monitor import MonitorAgent
 from .task import TaskingManager
 
@@ -56,10 +59,14 @@ class Spotlite:
         # Loop through the bbox aois and search and append the results to the map.
         logging.info(f"Number of AOIs: {len(aois_list)}.")
         
+        # Search nearby AOIs together rather than one archive search per AOI.  Every capture is kept for
+        # the map, so only the fields the animation uses are pushed down to the archive.
+        tiles_by_aoi = self.tile_manager.get_tiles_for_aois(aois_list, start_date, end_date, fields=SEARCH_FIELDS)
+
         animation_filename = None
         for index, aoi in enumerate(aois_list):
             logging.info(f"Processing AOI #: {index+1}")
-            tiles_gdf, num_tiles, num_captures = self.tile_manager.get_tiles(aoi, start_date, end_date)
+            tiles_gdf, num_tiles, num_captures = tiles_by_aoi[index]
 
             if num_tiles >0:
                 if 'eo:cloud_cover' not in tiles_gdf.columns:
@@ -106,30 +113,39 @@ class Spotlite:
             chunk_start_str = chunk_start.split('T')[0]  # Split by 'T' and take the first part (date)
             chunk_end_str = chunk_end.split('T')[0]
             logging.warning(f"Date Range For Search: {chunk_start_str} - {chunk_end_str}")
-            tiles_gdf, num_tiles, num_captures = self.tile_manager.get_tiles(aoi, chunk_start_str, chunk_end_str)
 
-            logging.warning(f"Search complete! Num Tiles: {num_tiles}, Num Captures: {num_captures}")
+            # Reduce each batch of tiles to capture footprints as the searches complete.
+            footprints = {}
+            num_tiles = 0
+            for tiles_gdf in self.tile_manager.iter_tiles(aoi, chunk_start_str, chunk_end_str):
+                num_tiles += len(tiles_gdf)
+                grouped = self.tile_manager.group_by_outcome_id(tiles_gdf)
+                for outcome_id, group in grouped:
+                    footprint = footprints.setdefault(outcome_id, {
+                        'cloud_covers': [],
+                        'geometries': [],
+                        'capture_date': group.iloc[0]['capture_date']
+                    })
+                    footprint['cloud_covers'].extend(group['eo:cloud_cover'])
+                    footprint['geometries'].append(group.geometry.unary_union)
+
+            logging.warning(f"Search complete! Num Tiles: {num_tiles}, Num Captures: {len(footprints)}")
             
             # If no tiles found then return True.
             if num_tiles == 0:
                 return True  
             
-            grouped = self.tile_manager.group_by_outcome_id(tiles_gdf)
-            # Create a new GeoDataFrame to store results
-            output_gdf = gpd.GeoDataFrame(columns=['outcome_id', 'cloud_cover_mean', 'capture_date', 'geometry'])
-
             rows_list = []
 
-            for outcome_id, group in grouped:
-                cloud_cover_mean = int(round(group['eo:cloud_cover'].mean()))
-                combined_footprint = group.geometry.unary_union
-                capture_date = group.iloc[0]['capture_date']
+            for outcome_id, footprint in footprints.items():
+                cloud_cover_mean = int(round(pd.Series(footprint['cloud_covers']).mean()))
+                combined_footprint = unary_union(footprint['geometries'])
 
                 # Add the information to the new GeoDataFrame
                 rows_list.append({
                     'outcome_id': outcome_id, 
                     'cloud_cover_mean': cloud_cover_mean, 
-                    'capture_date': capture_date, 
+                    'capture_date': footprint['capture_date'], 
                     'geometry': combined_footprint
                 })
             
@@ -166,8 +182,13 @@ class Spotlite:
 
     def create_cloud_free_basemap(self, aoi: Polygon, start_date: str, end_date: str):
         """Create a cloud free basemap using the latest cloud free tile from the archive."""
-        # Search The Archive
-        tiles_gdf, num_tiles, num_captures = self.tile_manager.get_tiles(aoi, start_date, end_date)
+        # Search The Archive newest-first for the latest tile of each grid cell, letting it drop
+        # the cloudy and partial tiles, the same filters filter_and_sort_tiles applies.
+        tiles_gdf, num_tiles, num_captures = self.tile_manager.get_latest_tiles(
+            aoi, start_date, end_date,
+            max_cloud_cover=self.tile_manager.cloud_threshold,
+            min_valid_pixel=self.tile_manager.valid_pixel_percent_for_basemap,
+            fields=SEARCH_FIELDS)
 
         logging.warning(f"Search complete! Num Tiles: {num_tiles}, Num Captures: {num_captures}")
 
@@ -198,7 +219,8 @@ class Spotlite:
             logging.warning("No tiles found!")            
 
     def create_cloud_heatmap(self, aoi, start_date, end_date, out_filename=None):
-        tiles_gdf, num_tiles, num_captures = self.tile_manager.get_tiles(aoi, start_date, end_date)
+        # The heatmap only shows the youngest tile per grid cell, so reduce the tiles while searching.
+        tiles_gdf, num_tiles, num_captures = self.tile_manager.get_latest_tiles_by_grid(aoi, start_date, end_date)
         logging.warning(f"Search complete! Num Tiles: {num_tiles}, Num Captures: {num_captures}")
 
         if num_tiles > 0:
@@ -209,7 +231,8 @@ class Spotlite:
             logging.warning("No Tiles Found.")
 
     def create_count_heatmap(self, aoi, start_date, end_date, out_filename=None):
-        tiles_gdf, num_tiles, num_captures = self.tile_manager.get_tiles(aoi, start_date, end_date)
+        # The heatmap only shows one tile per grid cell with its count, so reduce the tiles while searching.
+        tiles_gdf, num_tiles, num_captures = self.tile_manager.get_latest_tiles_by_grid(aoi, start_date, end_date)
 
         logging.warning(f"Search complete! Num Tiles: {num_tiles}, Num Captures: {num_captures}")
         if num_tiles > 0:
@@ -224,6 +247,11 @@ class Spotlite:
         tiles_gdf = self.tile_manager.get_tiles_for_outcome_id(outcome_id)
         self.tile_manager.download_tiles(tiles_gdf, output_dir) 
 
+    def download_images(self, outcome_ids: List[str], output_dir: str):
+        """Downloads the tiles of many captures, looked up together rather than one search per capture."""
+        tiles_gdf = self.tile_manager.get_tiles_for_outcome_ids(outcome_ids)
+        return self.tile_manager.download_tiles(tiles_gdf, output_dir)
+
     def download_tiles(self, points: List[Dict[str, float]], width: float, start_date, end_date, output_dir=None):
         """"Downloads Tiles for a specified list of points with a width during a time period"""
         # Create aois_list
@@ -235,9 +263,12 @@ class Spotlite:
         # To store output filenames from all AOIs
         all_output_filenames: List[str] = []
 
+        # Search nearby AOIs together rather than one archive search per AOI.
+        tiles_by_aoi = self.tile_manager.get_tiles_for_aois(aois_list, start_date, end_date)
+
         for index, aoi in enumerate(aois_list):
             logging.info(f"Processing AOI #: {index+1}")
-            tiles_gdf, num_tiles, num_captures = self.tile_manager.get_tiles(aoi, start_date, end_date)
+            tiles_gdf, num_tiles, num_captures = tiles_by_aoi[index]
 
             if num_tiles >0:
                 # We want to save the tiles into their respective captures to then animate them.
@@ -19,9 +19,15 @@
 #   filter_and_sort_tiles
 #   create_folium_basemap
 #   create_aois_from_points
+#   get_tiles_for_outcome_ids
 #   get_tiles
+#   get_latest_tiles
+#   get_tiles_for_aois
+#   iter_tiles
+#   get_latest_tiles_by_grid
+#   grid_summary
 
-from typing import Tuple, Dict, Optional, List, Type
+from typing import Tuple, Dict, Optional, List, Type, Iterator
 import os
 import math
 from io import BytesIO
@@ -33,11 +39,12 @@ import warnings
 from rasterio.errors import NotGeoreferencedWarning
 import rasterio
 from rasterio.enums import Resampling
-from rasterio.warp import reproject, Resampling
-from rasterio.transform import from_origin
+from rasterio.warp import reproject, transform_bounds, Resampling
+from rasterio.transform import from_origin, Affine
+from rasterio.crs import CRS
 from rasterio.io import MemoryFile
-import requests
-import shutil
+from rasterio.windows import Window
+from rasterio.coords import disjoint_bounds
 import sys
 from rasterio.merge import merge
 import plotly.express as px
@@ -47,20 +54,36 @@ from shapely.geometry import shape, box, Polygon
 from geopy.distance import distance
 from PIL import Image
 from datetime import datetime
-import imageio
 from PIL import ImageDraw, ImageFont, Image
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from contextlib import ExitStack
 from pathlib import Path
 from packaging import version
 import logging
+import weakref
 import plotly.graph_objs as go
 import branca.colormap as cm
 import folium
 from folium import raster_layers
 from .search import Searcher 
+from .catalog import tile_url
+from .download import TileDownloader
+from .assets import AssetCache, REMOTE_READ_OPTIONS
+from .encode import open_encoder, ANIMATION_EXTENSIONS, CONTACT_SHEET_EXTENSIONS
+from .frames import FrameStore
+from .cube import StackCube
+from .cache import aoi_hash
 
 logger = logging.getLogger(__name__)
 
+# Tile size of the streamed mosaic GeoTIFFs.
+MOSAIC_TILE_SIZE = 512
+
+# Columns of the grid summary that aggregate over all tiles of a grid cell.
+GRID_TOTAL_COLUMNS = ['image_count', 'latest_capture', 'min_cloud_cover', 'min_data_age']
+
 class TileManager:
     def __init__(self, key_id="", key_secret=""):
         # Set Defaults
@@ -73,8 +96,42 @@ class TileManager:
         self.cloud_threshold = 30
         self._param = None
 
+        # Per grid:code summaries keyed by the id of the tiles frame they were computed for.
+        self._grid_summaries = {}
+
         self.searcher = Searcher(self.key_id, self.key_secret)
 
+        # Tiles are downloaded in parallel over one pooled session.
+        self.downloader = TileDownloader(max_workers=8)
+
+        # Every asset read goes through one local cache keyed by item id and asset role.
+        self.asset_cache = AssetCache(downloader=self.downloader)
+
+        # Resolution of the animation mosaics in raster units (meters), None keeps the native resolution.
+        self.mosaic_resolution = None
+
+        # Executor of the per-capture mosaics: "thread", "process" or a concurrent.futures executor.
+        # Processes suit many large captures, they only pay off once mosaicking outweighs starting the workers.
+        self.mosaic_executor = "thread"
+        self.mosaic_workers = None  # Defaults to the number of cores.
+
+        # Memory budget of the streamed mosaic writer, None mosaics whole captures in memory.
+        self.mosaic_block_mb = 64
+
+        # Also write every animation frame as a "_resized.tiff" GeoTIFF next to its mosaic.
+        self.keep_frame_tiffs = False
+
+        # Animation output: "gif", "mp4" (H.264) or "webp", with frames capped to max_frame_size pixels a side.
+        # GIF and WebP hold every frame in memory until the animation is written, so their memory grows with
+        # the number of frames times max_frame_size squared, MP4 is streamed.
+        self.animation_format = "gif"
+        self.animation_quality = None  # 0 to 100, None uses the format's default.
+        self.max_frame_size = 2048  # None keeps the mosaic resolution.
+
+        # Per-AOI animation frames, with use_frame_store only the captures not in it yet are mosaicked.
+        self.frame_store = FrameStore()
+        self.use_frame_store = False
+
     @property
     def param(self):
         return self._param
@@ -83,71 +140,131 @@ class TileManager:
     def param(self, value):
         self._param = value
 
-    def animate_tile_stack(self, tiles_gdf, bbox_aoi, font=None):
+    def animate_tile_stack(self, tiles_gdf, bbox_aoi, font=None, renditions=None):
+        """Mosaics every capture and animates the stack.  Returns (animation filename, mosaic filenames).
+        renditions is a list of dicts with 'format' ("gif", "mp4", "webp", or "png" and "jpeg" for a
+        contact sheet of the frames), 'max_size' and 'period_sec', defaulting to animation_format,
+        max_frame_size and period_between_frames.  All of them are made from one mosaic pass and the
+        animation filename is then a list in the order of the renditions.
+        With use_frame_store the captures already in the frame store of the aoi are not mosaicked again,
+        the animation is encoded from the stored frames and the mosaic filenames are those of the new captures."""
         abs_output_animation_filename = None
         if tiles_gdf.empty:
             logger.warning("No items found to be animated.")
             return None
 
-        fnames = []
         grouped = self.group_by_outcome_id(tiles_gdf)
 
         # if not font is specified, use default font
         if font is None:
             font = ImageFont.load_default()
 
-        global max_tile_count
         max_tile_count = max(len(group) for _, group in grouped)
 
-        # Use ThreadPoolExecutor to process groups in parallel
-        with ThreadPoolExecutor() as executor:
-            # Create a list to hold the Future objects
-            futures = []
-
-            # Iterate over each group and submit it for processing
-            for outcome_id, group_df in grouped:
-                # Use first tile capture_time
-                capture_date = group_df.iloc[0]['capture_date']
-                
-                # Submit the group to the process_group function
-                future = executor.submit(self._process_group, capture_date, outcome_id, group_df)
-                # Add the future to the list
-                futures.append(future)
-
-            # Iterate over the futures as they complete
-            for future in as_completed(futures):
-                # Get the result from the future
-                result = future.result()
-                # If there's a result, add it to the fnames list
-                if result:
-                    fnames.append(result)
+        # One self-contained, picklable job per capture.
+        jobs = []
+        for outcome_id, group_df in grouped:
+            # Use first tile capture_time
+            capture_date = group_df.iloc[0]['capture_date']
+            fname = f"CaptureDate_{capture_date.strftime('%Y%m%dT%H%M%S')}_MosaicCreated_{datetime.now().strftime('%Y%m%dT%H%M%S')}.tiff"
+            jobs.append({'capture_date': capture_date, 'outcome_id': outcome_id, 'tiles': group_df,
+                         'max_tile_count': max_tile_count, 'aoi': bbox_aoi, 'outfile': os.path.join('images', fname)})
+
+        now = datetime.now().strftime("%Y%m%dT%H%M%S")
+        output_renditions = [self._resolve_rendition(rendition, index, now, renditions is not None)
+                             for index, rendition in enumerate(renditions if renditions is not None else [{}])]
+
+        if self.use_frame_store:
+            grid, fnames, frame_ids = self._update_frame_store(jobs, bbox_aoi, self._renditions_max_size(output_renditions))
+        else:
+            results = self._run_mosaic_jobs(jobs)
+            fnames = [fname for fname in results if fname]
+            # The frames cover the footprints of the captures that were mosaicked.
+            footprints = [geometry for job, fname in zip(jobs, results) if fname for geometry in job['tiles'].geometry]
 
         animate_images = "y" #input("Animate stack of tiles? (y/n):") or "y"
 
         if animate_images == "y":
             try:
                 logger.info("Animating Images...")
-                seconds_between_frames = self.period_between_frames
-                now = datetime.now().strftime("%Y%m%dT%H%M%S")
-                output_animation_filename = f'images/Stack_Animation_Video_{now}.GIF'
-
-                self._create_animation_from_files(fnames, output_animation_filename, seconds_between_frames, bbox_aoi, font)
+                if self.use_frame_store:
+                    if grid is not None:
+                        frames = self.frame_store.frames(bbox_aoi, frame_ids)
+                        self._encode_renditions(frames, grid, output_renditions, bbox_aoi, font)
+                else:
+                    self._create_animations_from_files(fnames, output_renditions, bbox_aoi, font, footprints)
                 # create_before_and_after(fnames)
 
-                # Validate that the file was actually created
-                if os.path.isfile(output_animation_filename):
-                    abs_output_animation_filename = os.path.abspath(output_animation_filename)
-                    abs_output_animation_filename = abs_output_animation_filename.replace('\\', '/')
-                    logger.warning(f"Animation File Created: {abs_output_animation_filename}")
-                else:
-                    logger.warning("Animation file was not created. Check for errors in create_animation_from_files.")
-                    return None
+                # Validate that the files were actually created
+                output_filenames = []
+                for rendition in output_renditions:
+                    if not os.path.isfile(rendition['filename']):
+                        logger.warning("Animation file was not created. Check for errors in create_animations_from_files.")
+                        return None
+                    output_filename = os.path.abspath(rendition['filename']).replace('\\', '/')
+                    logger.warning(f"Animation File Created: {output_filename}")
+                    output_filenames.append(output_filename)
+                abs_output_animation_filename = output_filenames if renditions is not None else output_filenames[0]
             except Exception as e:
                 logger.error(f"Error occurred while creating animation: {e}")
                 return None
 
         return abs_output_animation_filename, fnames
 
+    def build_stack_cube(self, tiles_gdf, aoi, resolution=None, cube_dir=None) -> Optional[StackCube]:
+        """Mosaics every capture over the aoi onto one grid and stores them as an aligned
+        (time, band, y, x) StackCube, at resolution raster units per pixel, the native one when None.
+        An existing cube in cube_dir is extended with the captures it does not hold yet, which must be
+        newer than its last one.  Returns None if no capture could be mosaicked."""
+        if tiles_gdf.empty:
+            logger.warning("No items found to build a cube from.")
+            return None
+        if cube_dir is None:
+            cube_dir = os.path.join("databases", "stack_cubes", f"{aoi_hash(aoi)}_{resolution or 'native'}")
+        cube = StackCube(cube_dir) if os.path.isfile(os.path.join(cube_dir, "meta.json")) else None
+        known = set(cube.outcome_ids) if cube is not None else set()
+
+        grouped = self.group_by_outcome_id(tiles_gdf)
+        max_tile_count = max(len(group) for _, group in grouped)
+
+        jobs = []
+        for outcome_id, group_df in grouped:
+            if outcome_id in known:
+                continue
+            capture_date = group_df.iloc[0]['capture_date']
+            if cube is not None and len(cube) > 0 and capture_date.isoformat(timespec='seconds') < str(cube.times[-1]):
+                logger.warning(f"Skipping capture {outcome_id} of {capture_date}, older than the last slice of the cube.")
+                continue
+            fname = f"CaptureDate_{capture_date.strftime('%Y%m%dT%H%M%S')}_MosaicCreated_{datetime.now().strftime('%Y%m%dT%H%M%S')}.tiff"
+            jobs.append({'capture_date': capture_date, 'outcome_id': outcome_id, 'tiles': group_df, 'max_tile_count': max_tile_count,
+                         'aoi': aoi, 'resolution': resolution, 'outfile': os.path.join('images', fname)})
+        jobs.sort(key=lambda job: job['capture_date'])
+        logger.warning(f"Cube has {len(known)} captures, mosaicking {len(jobs)}.")
+
+        mosaicked = [(job, fname) for job, fname in zip(jobs, self._run_mosaic_jobs(jobs)) if fname]
+        if not mosaicked:
+            return cube
+
+        fnames = [fname for _, fname in mosaicked]
+        if cube is None:
+            footprints = [geometry for job, _ in mosaicked for geometry in job['tiles'].geometry]
+            grid = self._frame_grid(fnames, aoi, footprints)
+            crs, transform, width, height = grid
+            with rasterio.open(fnames[0]) as src:
+                dtype = src.dtypes[0]
+            cube = StackCube.create(cube_dir, crs.to_wkt(), list(transform)[:6], (3, height, width), dtype)
+        else:
+            _, height, width = cube.slice_shape
+            grid = (CRS.from_wkt(cube.crs), Affine(*cube.transform), width, height)
+
+        # The slices are warped one at a time into one preallocated array.
+        frame = np.zeros(cube.slice_shape, dtype=cube.dtype)
+        for job, fname in mosaicked:
+            cube.append(self._warp_frame(fname, grid, frame), job['capture_date'], job['outcome_id'], job['tiles']['eo:cloud_cover'].mean())
+
+        logger.warning(f"Cube {cube_dir} holds {len(cube)} captures of shape {cube.slice_shape}.")
+        return cube
+
     def download_tiles(self, tiles_gdf, output_dir=None) -> List[str]:
 
         if tiles_gdf is None:
@@ -169,18 +286,15 @@ class TileManager:
             directory_name = output_dir
         self._ensure_dir(directory_name)
 
-        output_filenames_list = []
-
-        # Go through each tile and write out to the target location
+        # Go through each tile and collect the ones to download
+        download_jobs = []
         for index, (outcome_id, group) in enumerate(grouped_items_GPDF):
-            logger.warning(f"Downloading Capture Num: {index+1}, Outcome_Id: {outcome_id}")
+            logger.warning(f"Queueing Capture Num: {index+1}, Outcome_Id: {outcome_id}")
             logger.debug(f"Len of Group: {len(group)}")
             
             tile_number = 1
             
             for id, tile_gdf in group.iterrows():
-                self._show_progress_bar(tile_number, len(group))
-
                 logger.debug(f"Processing Tile: {tile_number}")
                 # Check the tile cloud cover and reject if cloudy.
                 cloud_cover = tile_gdf['eo:cloud_cover']
@@ -190,39 +304,35 @@ class TileManager:
                 elif cloud_cover > self.cloud_threshold:
                     logger.debug(f"Tile Rejected With Cloud Cover Of: {cloud_cover:.0f}")
                 else:
-                    url = tile_gdf['analytic_url']
-                    logger.debug(f"Tile ID/Analytic URL: {tile_number}/{url}")
                     capture_date_str = tile_gdf['capture_date'].strftime("%Y-%m-%dT%H%M%SZ")
                     tile_filename = os.path.join(directory_name, f"L1B_Tile_CD_{capture_date_str}_ID_{tile_number}.tif")
                     logger.debug(f"Tile_filename: {tile_filename}")
+                    download_jobs.append((tile_gdf, tile_filename))
 
-                    # Download and save the tile
-                    try:
-                        with requests.get(url, stream=True) as r:
-                            r.raise_for_status()
-                            with open(tile_filename, 'wb') as f:
-                                shutil.copyfileobj(r.raw, f)
-                            output_filenames_list.append(tile_filename)
-                    except Exception as e:
-                        logger.error(f"Failed to save tile: {e}")
-
-                
                 # Increment tile_number at the end of each iteration
                 tile_number += 1
-            self._show_progress_bar(tile_number, len(group))
+
+        # Fetch the tiles into the asset cache in parallel, then link them into the output directory.
+        output_filenames_list = []
+        if download_jobs:
+            cached_paths = self.asset_cache.get_paths([tile for tile, _ in download_jobs], 'analytic', self._show_progress_bar)
             print("\n")
+            for cached_path, (_, tile_filename) in zip(cached_paths, download_jobs):
+                if cached_path is not None:
+                    output_filenames_list.append(self.asset_cache.link(cached_path, tile_filename))
+
         logger.warning("Tile Download Completed.") #add a new line after the progress bar.
         # print(output_filenames_list)
         return output_filenames_list
 
     def group_by_capture_date(self, gdf: gpd.GeoDataFrame) -> DataFrameGroupBy:
         # Grouping the data by capture_date
-        grouped = gdf.groupby([gpd.pd.Grouper(key="capture_date", freq="S"), "satl:outcome_id"])
+        grouped = gdf.groupby([gpd.pd.Grouper(key="capture_date", freq="S"), "satl:outcome_id"], observed=True)
         return grouped  # A GeoPandas DataFrameGroupBy object
 
     def group_by_outcome_id(self, gdf: gpd.GeoDataFrame) -> DataFrameGroupBy:
         # Grouping the data by outcome id
-        grouped = gdf.groupby("satl:outcome_id")
+        grouped = gdf.groupby("satl:outcome_id", observed=True)
         return grouped  # A GeoPandas DataFrameGroupBy object
     
     def _show_progress_bar(self, iteration, total, bar_length=50):
@@ -237,6 +347,9 @@ class TileManager:
     def age_heatmap(self, tiles_gdf: Dict, out_filename: str = None) -> folium.Map:
         """Creates a heat map based on age of data, using a linear color map."""
 
+        # Only the youngest tile of each grid cell is visible, take them from the grid summary.
+        tiles_gdf = self._summary_tiles(tiles_gdf)
+
         # Sort the GeoDataFrame based on data_age, so that less old squares are on top
         tiles_gdf = tiles_gdf.sort_values(by='data_age', ascending=False)
 
@@ -286,10 +399,8 @@ class TileManager:
     def count_heatmap(self, tiles_gdf: Dict, out_filename: str = None) -> folium.Map:
         """Creates a heat map based on quantity of available data using a linear color map."""
 
-        # Keep only the latest tile for each grid code.
-        # Since they are sorted by age with the youngest last, we can drop duplicates except for the last one.
-        # All tiles in a gridcode have the same tilecount field.
-        tiles_gdf = tiles_gdf.drop_duplicates(subset='grid:code', keep='last')
+        # Keep only the latest tile for each grid code, with the image_count of the whole grid cell.
+        tiles_gdf = self._summary_tiles(tiles_gdf)
 
         # Sort by age so that youngest tiles are last (and thus displayed on top)
         tiles_gdf = tiles_gdf.sort_values(by='data_age', ascending=False)
@@ -338,8 +449,8 @@ class TileManager:
             logger.warning("No items found.")
             return None  # or however you want to handle an empty response
 
-        # Reset index to have 'id' as a column for px.choropleth_mapbox
-        tiles_gdf.reset_index(inplace=True)
+        # Keep only the latest tile for each grid code, indexed from 0 for px.choropleth_mapbox
+        tiles_gdf = self._summary_tiles(tiles_gdf)
 
         # Calculate the total bounds of the GeoDataFrame
         minx, miny, maxx, maxy = tiles_gdf.total_bounds
@@ -356,11 +467,6 @@ class TileManager:
         #                                     <= self.cloud_threshold].copy()
         cloud_filtered_tiles_gdf = tiles_gdf
 
-        # Rest of your code remains the same
-        cloud_filtered_tiles_gdf.sort_values(by='data_age', ascending=True, inplace=True)
-
-        cloud_filtered_tiles_gdf.drop_duplicates(subset='grid:code', keep='first', inplace=True)
-
         # Create figure if not provided
         if existing_fig is None:
             fig = px.choropleth_mapbox(
@@ -583,12 +689,165 @@ class TileManager:
         tiles_gdf = self.searcher.search_archive_for_outcome_id(outcome_id)
         return tiles_gdf
 
-    def get_tiles(self, aoi: Polygon, start_date_str: str, end_date: str):
-        """Gets tiles from the STAC Catalog"""
+    def get_tiles_for_outcome_ids(self, outcome_ids: List[str]):
+        """Gets tiles from the STAC Catalog for many captures at once, sorted by outcome_id"""
+        tiles_gdf = self.searcher.search_archive_for_outcome_ids(outcome_ids)
+        return tiles_gdf
+
+    def get_tiles(self, aoi: Polygon, start_date_str: str, end_date: str, max_cloud_cover=None, min_valid_pixel=None,
+                  min_product_version=None, fields=None):
+        """Gets tiles from the STAC Catalog, optionally filtered by the archive"""
 
         # Search the catalog for tiles.
-        tiles_gdf = self.searcher.search_archive(aoi, start_date_str, end_date)
-        
+        tiles_gdf = self.searcher.search_archive(aoi, start_date_str, end_date, max_cloud_cover, min_valid_pixel,
+                                                 min_product_version, fields)
+        return self._summarize_tiles(tiles_gdf)
+
+    def get_latest_tiles(self, aoi: Polygon, start_date_str: str, end_date: str, tiles_per_grid=1, max_captures=None,
+                         max_cloud_cover=None, min_valid_pixel=None, min_product_version=None, fields=None):
+        """Gets the latest tiles of each grid cell, searching the archive newest-first until they are found"""
+        tiles_gdf = self.searcher.search_latest(aoi, start_date_str, end_date, tiles_per_grid, max_captures,
+                                                max_cloud_cover, min_valid_pixel, min_product_version, fields)
+        return self._summarize_tiles(tiles_gdf)
+
+    def get_tiles_for_aois(self, aois: List[Polygon], start_date_str: str, end_date: str, max_cloud_cover=None,
+                           min_valid_pixel=None, min_product_version=None, fields=None) -> Dict[int, Tuple]:
+        """Gets tiles for many AOIs, searching each cluster of nearby AOIs only once.
+        Returns a dict from AOI index to the (tiles_gdf, num_tiles, num_captures) of get_tiles."""
+        tiles_by_aoi = self.searcher.search_many(aois, start_date_str, end_date, max_cloud_cover, min_valid_pixel,
+                                                 min_product_version, fields)
+        return {index: self._summarize_tiles(tiles_by_aoi[index]) for index in range(len(aois))}
+
+    def iter_tiles(self, aoi: Polygon, start_date_str: str, end_date: str) -> Iterator[gpd.GeoDataFrame]:
+        """Yields tiles from the STAC Catalog in batches as the searches complete"""
+        yield from self.searcher.iter_search(aoi, start_date_str, end_date)
+
+    def get_latest_tiles_by_grid(self, aoi: Polygon, start_date_str: str, end_date: str):
+        """Gets the youngest and best tile of each grid cell, with image_count over the whole date range.
+        Batches are reduced as they arrive so at most two tiles per grid cell are held in memory.
+        The grid summary of the whole search is cached for the returned tiles."""
+        candidates_gdf = None
+        batch_summaries = []
+        outcome_ids = set()
+        for batch_gdf in self.iter_tiles(aoi, start_date_str, end_date):
+            outcome_ids.update(batch_gdf['satl:outcome_id'].unique())
+            batch_summaries.append(self._compute_grid_summary(batch_gdf)[GRID_TOTAL_COLUMNS])
+
+            if candidates_gdf is not None:
+                batch_gdf = pd.concat([candidates_gdf, batch_gdf], ignore_index=True)
+            candidates_gdf = self._reduce_to_summary_tiles(batch_gdf)
+
+        if candidates_gdf is None:
+            logging.warning("No Tiles Found")
+            return None, 0, 0
+
+        # Merge the per-batch totals into the summary of the kept tiles.
+        totals = pd.concat(batch_summaries).groupby(level=0).agg(
+            {'image_count': 'sum', 'latest_capture': 'max', 'min_cloud_cover': 'min', 'min_data_age': 'min'})
+        summary = self._compute_grid_summary(candidates_gdf)
+        summary[GRID_TOTAL_COLUMNS] = totals.loc[summary.index, GRID_TOTAL_COLUMNS]
+        candidates_gdf['image_count'] = candidates_gdf['grid:code'].map(summary['image_count']).astype(int)
+        self._cache_grid_summary(candidates_gdf, summary, (self.cloud_threshold, self.valid_pixel_percent_for_basemap))
+
+        return candidates_gdf, int(summary['image_count'].sum()), len(outcome_ids)
+
+    def grid_summary(self, tiles_gdf, cloud_cover=None, valid_pixels_perc=None) -> pd.DataFrame:
+        """Summary of the tiles of each grid:code, computed in one vectorized pass and cached per tiles frame.
+        Columns: image_count, latest_capture, min_cloud_cover, min_data_age, and the positions in tiles_gdf of
+        the latest tile and of the best tile, the latest one passing the cloud cover and valid pixel
+        thresholds (-1 if there is none).  The cache remembers tiles by index label, so a frame reordered
+        in place gets the positions of its new order, and one whose tiles were replaced is summarized again."""
+        thresholds = (self.cloud_threshold if cloud_cover is None else cloud_cover,
+                      self.valid_pixel_percent_for_basemap if valid_pixels_perc is None else valid_pixels_perc)
+        cached = self._cached_grid_summary(tiles_gdf, thresholds)
+        if cached is not None:
+            return cached
+
+        summary = self._compute_grid_summary(tiles_gdf, *thresholds)
+        self._cache_grid_summary(tiles_gdf, summary, thresholds)
+        return summary
+
+    def _compute_grid_summary(self, tiles_gdf, cloud_cover=None, valid_pixels_perc=None) -> pd.DataFrame:
+        if cloud_cover is None:
+            cloud_cover = self.cloud_threshold
+        if valid_pixels_perc is None:
+            valid_pixels_perc = self.valid_pixel_percent_for_basemap
+
+        nan = pd.Series(np.nan, index=tiles_gdf.index)
+        cloud_covers = pd.to_numeric(tiles_gdf.get('eo:cloud_cover', nan), errors='coerce')
+        valid_pixels = pd.to_numeric(tiles_gdf.get('valid_pixel_percent', nan), errors='coerce')
+        tiles = pd.DataFrame({
+            'grid:code': tiles_gdf['grid:code'].to_numpy(),
+            'capture_date': tiles_gdf['capture_date'].to_numpy(),
+            'data_age': tiles_gdf['data_age'].to_numpy(),
+            'cloud_cover': cloud_covers.to_numpy(dtype=float),
+            'is_best': ((cloud_covers <= cloud_cover) & (valid_pixels >= valid_pixels_perc)).to_numpy(),
+            'position': np.arange(len(tiles_gdf)),
+        })
+
+        # Newest first, so the first tile of each grid cell is its latest.
+        tiles = tiles.sort_values(by='capture_date', ascending=False, kind='stable')
+        summary = tiles.groupby('grid:code', sort=False).agg(
+            image_count=('position', 'size'),
+            latest_capture=('capture_date', 'max'),
+            min_cloud_cover=('cloud_cover', 'min'),
+            min_data_age=('data_age', 'min'),
+            latest_tile=('position', 'first'),
+        )
+        best_tiles = tiles[tiles['is_best']].drop_duplicates(subset='grid:code').set_index('grid:code')['position']
+        summary['best_tile'] = best_tiles.reindex(summary.index).fillna(-1).astype(int)
+        return summary
+
+    def _cache_grid_summary(self, tiles_gdf, summary, thresholds):
+        if not tiles_gdf.index.is_unique:
+            return
+        key = (id(tiles_gdf), thresholds)
+        has_best = summary['best_tile'].to_numpy() >= 0
+        positions = np.concatenate([summary['latest_tile'].to_numpy(), summary['best_tile'].to_numpy()[has_best]])
+        # The grid code and capture date of each tile, to check that a label still refers to the same tile.
+        tiles = (tiles_gdf.index.to_numpy()[positions], tiles_gdf['grid:code'].to_numpy()[positions],
+                 tiles_gdf['capture_date'].to_numpy()[positions])
+        self._grid_summaries[key] = (len(tiles_gdf), summary, has_best, tiles)
+        # Drop the entry with the frame, before its id can be reused.
+        weakref.finalize(tiles_gdf, self._grid_summaries.pop, key, None)
+
+    def _cached_grid_summary(self, tiles_gdf, thresholds) -> Optional[pd.DataFrame]:
+        """The cached summary with the positions of its tiles in tiles_gdf as it is now, None if it no longer applies."""
+        cached = self._grid_summaries.get((id(tiles_gdf), thresholds))
+        if cached is None:
+            return None
+        num_tiles, summary, has_best, (labels, grid_codes, capture_dates) = cached
+        if len(tiles_gdf) != num_tiles or not tiles_gdf.index.is_unique:
+            return None
+
+        positions = tiles_gdf.index.get_indexer(labels)
+        if (positions < 0).any():
+            return None
+        if not (np.array_equal(tiles_gdf['grid:code'].to_numpy()[positions], grid_codes) and
+                np.array_equal(tiles_gdf['capture_date'].to_numpy()[positions], capture_dates)):
+            return None
+
+        summary = summary.copy()
+        summary['latest_tile'] = positions[:len(summary)]
+        summary.loc[has_best, 'best_tile'] = positions[len(summary):]
+        return summary
+
+    def _summary_tiles(self, tiles_gdf, column='latest_tile', cloud_cover=None, valid_pixels_perc=None) -> gpd.GeoDataFrame:
+        """Returns one tile per grid cell, the latest or best tile of the grid summary, joined with its summary."""
+        summary = self.grid_summary(tiles_gdf, cloud_cover, valid_pixels_perc)
+        summary = summary[summary[column] >= 0]
+        summary_tiles_gdf = tiles_gdf.iloc[summary[column].to_numpy()].reset_index(drop=True)
+        for name in GRID_TOTAL_COLUMNS:
+            summary_tiles_gdf[name] = summary[name].to_numpy()
+        return summary_tiles_gdf
+
+    def _reduce_to_summary_tiles(self, tiles_gdf):
+        summary = self._compute_grid_summary(tiles_gdf)
+        positions = np.union1d(summary['latest_tile'], summary['best_tile'][summary['best_tile'] >= 0])
+        return tiles_gdf.iloc[positions].reset_index(drop=True)
+
+    def _summarize_tiles(self, tiles_gdf):
+        """Logs the captures in the search results and returns (tiles_gdf, num_tiles, num_captures)."""
         if tiles_gdf.empty:
             logging.warning("No Tiles Found")
             return None, 0, 0
@@ -645,14 +904,8 @@ class TileManager:
             logging.warning("No Tiles Found")
             return None
 
-        filtered_tiles_gdf = self.filter_tiles(tiles_gdf, cloud_cover, valid_pixels_perc)
-
-        # Sort by capture date
-        filtered_tiles_gdf.sort_values('capture_date', ascending=False, inplace=True)
-
-
-        # Group by grid cell and take the first (most recent) record
-        most_recent_cloud_free_tiles = filtered_tiles_gdf.groupby('grid:code').first().reset_index()
+        # The best tile of each grid cell is its most recent tile passing the filters.
+        most_recent_cloud_free_tiles = self._summary_tiles(tiles_gdf, 'best_tile', cloud_cover, valid_pixels_perc)
 
         return most_recent_cloud_free_tiles
 
@@ -677,7 +930,7 @@ class TileManager:
             # Adding image overlay
             bounds = [list(row.geometry.bounds[1::-1]), list(row.geometry.bounds[3:1:-1])]
 
-            image_url = row["thumbnail_url"]
+            image_url = tile_url(row, 'thumbnail')
             # logger.debug(f"Thumbnail image_url: {image_url}")
             raster_layers.ImageOverlay(image_url, bounds=bounds).add_to(folium_map)
 
@@ -685,12 +938,12 @@ class TileManager:
 
     def group_by_capture_date(self, gdf: gpd.GeoDataFrame) -> DataFrameGroupBy:
         # Grouping the data
-        grouped = gdf.groupby([gpd.pd.Grouper(key="capture_date", freq="S"), "satl:outcome_id"])
+        grouped = gdf.groupby([gpd.pd.Grouper(key="capture_date", freq="S"), "satl:outcome_id"], observed=True)
         return grouped  # A GeoPandas DataFrameGroupBy object
 
     def group_by_outcome_id(self, gdf: gpd.GeoDataFrame) -> DataFrameGroupBy:
         # Grouping the data by outcome id
-        grouped = gdf.groupby("satl:outcome_id")
+        grouped = gdf.groupby("satl:outcome_id", observed=True)
         return grouped  # A GeoPandas DataFrameGroupBy object
     
     def create_aois_from_points(
@@ -771,15 +1024,64 @@ class TileManager:
 
         return output_filenames
 
-    def _process_group(self, capture_date, outcome_id, group_df):
-        if False == self._is_group_valid(group_df):
+    def _process_group(self, job):
+        """Mosaics the capture of a job, returns the mosaic filename or None if the capture is rejected."""
+        if False == self._is_group_valid(job['tiles'], job['max_tile_count']):
             return None  # return None if the group is rejected
-        logger.info(f"Spawned Mosaic Process: {capture_date}, {outcome_id}")
+        logger.info(f"Spawned Mosaic Process: {job['capture_date']}, {job['outcome_id']}")
 
-        fname = f"CaptureDate_{capture_date.strftime('%Y%m%dT%H%M%S')}_MosaicCreated_{datetime.now().strftime('%Y%m%dT%H%M%S')}.tiff"
-        full_path = os.path.join('images', fname)
-        self._mosaic_analytic_tiles(group_df, full_path)
-        return full_path  # return the filename if the group is processed
+        resolution = job.get('resolution', self.mosaic_resolution)
+        if self.mosaic_block_mb is not None:
+            meta = self._stream_mosaic_analytic_tiles(job['tiles'], job['outfile'], aoi=job['aoi'], resolution=resolution)
+        else:
+            _, meta = self._mosaic_analytic_tiles(job['tiles'], job['outfile'], aoi=job['aoi'], resolution=resolution)
+        if meta is None:
+            return None
+        return job['outfile']  # return the filename if the group is processed
+
+    def _run_mosaic_jobs(self, jobs) -> List[Optional[str]]:
+        """Runs the per-capture mosaic jobs on the mosaic executor and returns their filenames."""
+        if not jobs:
+            return []
+        if isinstance(self.mosaic_executor, str) and self.mosaic_executor not in ("thread", "process"):
+            raise ValueError(f"Unknown mosaic executor {self.mosaic_executor}, expected \"thread\", \"process\" or an executor.")
+        if self.mosaic_executor == "thread":
+            with ThreadPoolExecutor(max_workers=self.mosaic_workers) as executor:
+                return list(executor.map(self._process_group, jobs))
+
+        settings = self._mosaic_settings()
+        if self.mosaic_executor == "process":
+            results = [None] * len(jobs)
+            failed = []
+            with ProcessPoolExecutor(max_workers=self.mosaic_workers, initializer=_init_mosaic_worker,
+                                     initargs=(settings,)) as executor:
+                futures = [executor.submit(_run_mosaic_job, settings, job) for job in jobs]
+                for index, future in enumerate(futures):
+                    try:
+                        results[index] = future.result()
+                    except BrokenProcessPool:
+                        failed.append(index)
+
+            if failed:
+                # Only the jobs lost with the pool are run again.
+                logger.warning(f"Mosaic process pool failed, mosaicking {len(failed)} of {len(jobs)} captures in threads instead.")
+                with ThreadPoolExecutor(max_workers=self.mosaic_workers) as executor:
+                    for index, fname in zip(failed, executor.map(self._process_group, [jobs[index] for index in failed])):
+                        results[index] = fname
+            return results
+
+        # An executor supplied by the caller, left running for its next use.
+        return list(self.mosaic_executor.map(_run_mosaic_job, repeat(settings), jobs))
+
+    def _mosaic_settings(self) -> Dict:
+        """The settings a mosaic job needs to rebuild this TileManager in a worker process."""
+        return {'cloud_threshold': self.cloud_threshold,
+                'min_product_version': self.min_product_version,
+                'min_tile_coverage_percent': self.min_tile_coverage_percent,
+                'mosaic_resolution': self.mosaic_resolution,
+                'mosaic_block_mb': self.mosaic_block_mb,
+                'asset_cache_dir': self.asset_cache.cache_dir,
+                'asset_cache_max_size_mb': self.asset_cache.max_size_mb}
 
     def _estimate_zoom_level(self, minx, miny, maxx, maxy):
         """Calculate the geographic extent."""
@@ -814,23 +1116,28 @@ class TileManager:
         # print(f"Zoom: {zoom_level}")
         return zoom_level
 
-    def _mosaic_analytic_tiles(self, tiles_gdf, outfile=None):
-        src_files_to_mosaic = []
-
-        for _, tile in tiles_gdf.iterrows():
-            # Open the satellite image file with rasterio
-            # If gen_preview is TRUE then we are doing this for Previews and not Analytics.
-            url = tile['analytic_url']
-            src = rasterio.open(url)
-            src_files_to_mosaic.append(src)
+    def _mosaic_analytic_tiles(self, tiles_gdf, outfile=None, aoi=None, resolution=None):
+        """Mosaics the analytic tiles of a capture.  Returns (None, None) if no tile could be read.
+        With an aoi only the tiles intersecting it are read, and only the window covering it, at
+        resolution raster units per pixel when given.  Tiles missing from the asset cache are then
+        read remotely with HTTP range requests, using the COG overviews at coarser resolutions."""
+        src_files_to_mosaic = self._open_analytic_tiles(tiles_gdf, aoi)
+        if not src_files_to_mosaic:
+            return None, None
 
-            outcome_id = tile['satl:outcome_id']
-            product_version = tile['satl:product_version']
-            if not self._is_version_valid(product_version):
-                logger.warning(f"Tile Version Incompatible: {outcome_id}, ProdVer: {product_version}")
+        # The footprints are in lon/lat, the rasters in the UTM zone of the capture.
+        crs = src_files_to_mosaic[0].crs
+        bounds = transform_bounds("EPSG:4326", crs, *aoi.bounds) if aoi is not None else None
+        res = (resolution, resolution) if resolution is not None else None
 
         # Create the mosaic
-        mosaic, out_trans = merge(src_files_to_mosaic, indexes=[1, 2, 3])
+        try:
+            with rasterio.Env(**REMOTE_READ_OPTIONS):
+                mosaic, out_trans = merge(src_files_to_mosaic, bounds=bounds, res=res, indexes=[1, 2, 3],
+                                          resampling=Resampling.average if res is not None else Resampling.nearest)
+        finally:
+            for src in src_files_to_mosaic:
+                src.close()
 
         # Metadata for the mosaic
         meta = {
@@ -838,7 +1145,7 @@ class TileManager:
             "height": mosaic.shape[1],
             "width": mosaic.shape[2],
             "transform": out_trans,
-            "crs": tiles_gdf.crs,
+            "crs": crs,
             "count": mosaic.shape[0],
             "dtype": mosaic.dtype
         }
@@ -851,6 +1158,102 @@ class TileManager:
 
         return mosaic, meta
 
+    def _stream_mosaic_analytic_tiles(self, tiles_gdf, outfile, aoi=None, resolution=None) -> Optional[Dict]:
+        """Mosaics the analytic tiles of a capture block by block into a tiled, compressed GeoTIFF.
+        Each block only reads the tile windows it covers, so the memory used is set by mosaic_block_mb
+        rather than by the size of the capture.  Returns the mosaic metadata, None if no tile could be read."""
+        src_files_to_mosaic = self._open_analytic_tiles(tiles_gdf, aoi)
+        if not src_files_to_mosaic:
+            return None
+
+        try:
+            # The output grid, as merge would lay it out.
+            crs = src_files_to_mosaic[0].crs
+            dtype = src_files_to_mosaic[0].dtypes[0]
+            if aoi is not None:
+                left, bottom, right, top = transform_bounds("EPSG:4326", crs, *aoi.bounds)
+            else:
+                left = min(src.bounds.left for src in src_files_to_mosaic)
+                bottom = min(src.bounds.bottom for src in src_files_to_mosaic)
+                right = max(src.bounds.right for src in src_files_to_mosaic)
+                top = max(src.bounds.top for src in src_files_to_mosaic)
+            res_x, res_y = (resolution, resolution) if resolution is not None else src_files_to_mosaic[0].res
+            width = max(int(round((right - left) / res_x)), 1)
+            height = max(int(round((top - bottom) / res_y)), 1)
+            out_trans = from_origin(left, top, res_x, res_y)
+
+            meta = {
+                "driver": "GTiff",
+                "height": height,
+                "width": width,
+                "transform": out_trans,
+                "crs": crs,
+                "count": 3,
+                "dtype": dtype,
+                "tiled": True,
+                "blockxsize": MOSAIC_TILE_SIZE,
+                "blockysize": MOSAIC_TILE_SIZE,
+                "compress": "deflate",
+                "predictor": 2,
+                "BIGTIFF": "IF_SAFER"
+            }
+
+            # Square blocks of whole GeoTIFF tiles.  merge holds about six block sized arrays per band at once:
+            # its output, the masked read with its mask, the fill mask and temporaries.
+            block_pixels = self.mosaic_block_mb * 1024 * 1024 / (3 * 6 * np.dtype(dtype).itemsize)
+            block_size = max(int(math.sqrt(block_pixels)) // MOSAIC_TILE_SIZE, 1) * MOSAIC_TILE_SIZE
+            resampling = Resampling.average if resolution is not None else Resampling.nearest
+
+            with rasterio.Env(**REMOTE_READ_OPTIONS), rasterio.open(outfile, "w", **meta) as dest:
+                for row in range(0, height, block_size):
+                    for col in range(0, width, block_size):
+                        window = Window(col, row, min(block_size, width - col), min(block_size, height - row))
+                        block_bounds = rasterio.windows.bounds(window, out_trans)
+                        block_srcs = [src for src in src_files_to_mosaic if not disjoint_bounds(src.bounds, block_bounds)]
+                        if not block_srcs:
+                            continue  # Left empty, reads back as zeros.
+
+                        data, _ = merge(block_srcs, bounds=block_bounds, res=(res_x, res_y), indexes=[1, 2, 3], resampling=resampling)
+                        # Rounding can leave merge a pixel off the block shape.
+                        block = np.zeros((3, window.height, window.width), dtype=dtype)
+                        block_height = min(window.height, data.shape[1])
+                        block_width = min(window.width, data.shape[2])
+                        block[:, :block_height, :block_width] = data[:, :block_height, :block_width]
+                        dest.write(block, window=window)
+        finally:
+            for src in src_files_to_mosaic:
+                src.close()
+
+        logger.warning(f"Mosaic Complete:{outfile}")
+        return meta
+
+    def _open_analytic_tiles(self, tiles_gdf, aoi=None) -> List:
+        """Opens the analytic assets of the tiles intersecting the aoi, or of all tiles without one."""
+        if aoi is not None:
+            tiles_gdf = tiles_gdf[tiles_gdf.intersects(aoi)]
+
+        for _, tile in tiles_gdf.iterrows():
+            outcome_id = tile['satl:outcome_id']
+            product_version = tile['satl:product_version']
+            if not self._is_version_valid(product_version):
+                logger.warning(f"Tile Version Incompatible: {outcome_id}, ProdVer: {product_version}")
+
+        if aoi is None:
+            # Fetch the analytic assets into the asset cache in parallel and open the local copies.
+            cached_paths = self.asset_cache.get_paths(tiles_gdf, 'analytic')
+            src_files_to_mosaic = [rasterio.open(path) for path in cached_paths if path is not None]
+        else:
+            with ThreadPoolExecutor(max_workers=self.downloader.max_workers) as executor:
+                src_files_to_mosaic = list(executor.map(lambda tile: self.asset_cache.open(tile, 'analytic', fetch=False),
+                                                        [tile for _, tile in tiles_gdf.iterrows()]))
+            src_files_to_mosaic = [src for src in src_files_to_mosaic if src is not None]
+
+        if len(src_files_to_mosaic) < len(tiles_gdf):
+            logger.warning(f"Skipping {len(tiles_gdf) - len(src_files_to_mosaic)} tiles missing from the mosaic.")
+        if not src_files_to_mosaic:
+            logger.warning("No tiles to mosaic.")
+        return src_files_to_mosaic
+
 
     # def _georeference_preview(self, tile):
     #     with rasterio.open(tile['preview_url']) as src:
@@ -884,7 +1287,7 @@ class TileManager:
         with warnings.catch_warnings():
             warnings.simplefilter('ignore', NotGeoreferencedWarning)
             # Open the thumbnail and georeference it.
-            with rasterio.open(tile['thumbnail_url']) as src:
+            with self.asset_cache.open(tile, 'thumbnail') as src:
                 
                 min_x, min_y, max_x, max_y = shape(tile['geometry']).bounds
                 
@@ -947,15 +1350,9 @@ class TileManager:
         # Check that the version number is valid or not.
         return version.parse(product_version) >= version.parse(self.min_product_version)
 
-    def _is_group_valid(self, group_df):
-        global max_tile_count  # Use the global max_tile_count
-        global invalid_outcome_ids
+    def _is_group_valid(self, group_df, max_tile_count):
         tile_count = len(group_df)
 
-        if max_tile_count is None:
-            logger.error("Rejected: max_tile_count is not set!")
-            return False
-
         capture_date = group_df.iloc[0]['capture_date']
         # Rejection based on tile coverage
         if tile_count < max_tile_count * self.min_tile_coverage_percent:
@@ -967,7 +1364,6 @@ class TileManager:
         outcome_id = group_df.iloc[0]['satl:outcome_id']
 
         if not self._is_version_valid(product_version):
-            invalid_outcome_ids.append(outcome_id)
             logger.warning(f"Capture Rejected Due To Version: Product_Version: {product_version}, Cloud: {mean_cloud_cover:.0f}%, OutcomeId: {outcome_id}")
             return False
 
@@ -981,136 +1377,227 @@ class TileManager:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-    def _get_max_dimensions_and_bounds(self, image_filenames):
-        max_width, max_height = 0, 0
-        largest_bounds = None
-
-        for fname in image_filenames:
-            with rasterio.open(fname) as src:
-                width, height = src.width, src.height
-                bounds = src.bounds
-
-                max_width = max(max_width, width)
-                max_height = max(max_height, height)
+    def _frame_grid(self, image_filenames, bbox_aoi, footprints=None, max_size=None) -> Tuple:
+        """The common grid of the animation frames as (crs, transform, width, height).  It covers the
+        capture footprints within the aoi, in the CRS and at the resolution of the first mosaic,
+        coarsened so that neither side exceeds max_size."""
+        with rasterio.open(image_filenames[0]) as src:
+            crs = src.crs
+            res_x, res_y = src.res
+
+        # The footprints are in lon/lat, the mosaics in the UTM zone of the captures.
+        area = box(*bbox_aoi.bounds)
+        if footprints is not None and len(footprints) > 0:
+            covered = unary_union(list(footprints)).intersection(area)
+            if not covered.is_empty:
+                area = covered
+        left, bottom, right, top = transform_bounds("EPSG:4326", crs, *area.bounds)
+
+        if max_size is not None:
+            scale = max((right - left) / res_x, (top - bottom) / res_y) / max_size
+            if scale > 1:
+                res_x, res_y = res_x * scale, res_y * scale
+
+        width = max(int(math.ceil((right - left) / res_x)), 1)
+        height = max(int(math.ceil((top - bottom) / res_y)), 1)
+        return crs, from_origin(left, top, res_x, res_y), width, height
+
+    def _warp_frame(self, fname, grid, frame) -> np.ndarray:
+        """Warps a mosaic onto the frame grid in one resampling step, into the preallocated
+        (3, height, width) frame array.  Also writes it out as a GeoTIFF with keep_frame_tiffs."""
+        crs, transform, width, height = grid
+        frame.fill(0)
+        with rasterio.open(fname) as src:
+            # Averaging keeps downscaled frames from aliasing.
+            resampling = Resampling.average if transform.a > src.res[0] * 1.5 else Resampling.cubic
+            reproject(
+                source=rasterio.band(src, [1, 2, 3]),
+                destination=frame,
+                src_transform=src.transform,
+                src_crs=src.crs,
+                dst_transform=transform,
+                dst_crs=crs,
+                resampling=resampling
+            )
 
-                if largest_bounds is None:
-                    largest_bounds = bounds
-                else:
-                    largest_bounds = (
-                        min(largest_bounds[0], bounds[0]),  # min left
-                        min(largest_bounds[1], bounds[1]),  # min bottom
-                        max(largest_bounds[2], bounds[2]),  # max right
-                        max(largest_bounds[3], bounds[3])   # max top
-                    )
-
-        return max_width, max_height, largest_bounds
-
-    def _resize_mosaics_to_largest(self, image_filenames):
-        max_width, max_height, largest_bounds = self._get_max_dimensions_and_bounds(image_filenames)
-
-        # Create a list to store the names of resized images
-        new_filenames = []
-
-        for fname in image_filenames:
-            # Open the source file
-            with rasterio.open(fname) as src:
-                # Calculate new transform
-                out_transform = rasterio.transform.from_bounds(*largest_bounds, max_width, max_height)
-
-                # Update metadata
-                out_meta = src.meta.copy()
-                out_meta.update({
-                    "height": max_height,
-                    "width": max_width,
-                    "transform": out_transform
-                })
-
-                # Create a destination array
-                dest_data = np.zeros((src.count, max_height, max_width))
-
-                reproject(
-                    source=rasterio.band(src, range(1, src.count + 1)),  # All bands
-                    destination=dest_data,
-                    src_transform=src.transform,
-                    src_crs=src.crs,
-                    dst_transform=out_transform,
-                    dst_crs=src.crs,
-                    resampling=Resampling.cubic
-                )
-
-                # Change the filename for the new resized image
-                new_fname = fname.replace(".tiff", "_resized.tiff")
-
-                # Write out the resized image to a new file
-                with rasterio.open(new_fname, 'w', **out_meta) as dest:
-                    dest.write(dest_data)
-
-                # Append the new filename to our list
-                new_filenames.append(new_fname)
-
-        return new_filenames
-
-    def _create_animation_from_files(self, image_filenames, output_filename, pause_duration, bbox_aoi, font):
+        if self.keep_frame_tiffs:
+            meta = {"driver": "GTiff", "height": height, "width": width, "transform": transform,
+                    "crs": crs, "count": 3, "dtype": frame.dtype}
+            with rasterio.open(fname.replace(".tiff", "_resized.tiff"), 'w', **meta) as dest:
+                dest.write(frame)
+        return frame
+
+    def _frame_to_rgb(self, frame) -> np.ndarray:
+        """Converts a (3, height, width) frame to the (height, width, 3) uint8 image the encoder takes.
+        Float frames are taken as 0-1, or scaled by their maximum when they exceed 1."""
+        if np.issubdtype(frame.dtype, np.integer):
+            if frame.dtype != np.uint8:
+                frame = (frame.astype(np.float32) * (255.0 / np.iinfo(frame.dtype).max)).astype(np.uint8)
+        else:
+            frame = np.nan_to_num(frame.astype(np.float32))
+            max_value = frame.max(initial=0.0)
+            if max_value > 1.0:
+                frame = frame / max_value
+            frame = (np.clip(frame, 0.0, 1.0) * 255.0).astype(np.uint8)
+        return np.ascontiguousarray(frame.transpose(1, 2, 0))
+
+    def _resolve_rendition(self, rendition, index, now, is_named=True) -> Dict:
+        """A rendition with its defaults filled in and its output filename."""
+        format = rendition.get('format', self.animation_format)
+        if format not in ANIMATION_EXTENSIONS and format not in CONTACT_SHEET_EXTENSIONS:
+            raise ValueError(f"Unknown rendition format {format}.")
+        max_size = rendition.get('max_size', self.max_frame_size)
+        extension = ANIMATION_EXTENSIONS.get(format) or CONTACT_SHEET_EXTENSIONS[format]
+        suffix = f"_{index}_{max_size or 'full'}" if is_named else ""
+        return {'format': format, 'max_size': max_size,
+                'period_sec': rendition.get('period_sec', self.period_between_frames),
+                'filename': f'images/Stack_Animation_Video_{now}{suffix}{extension}'}
+
+    def _rendition_size(self, width, height, max_size) -> Tuple[int, int]:
+        """The frame size of a rendition, the frame grid scaled down so neither side exceeds max_size."""
+        if max_size is None or max(width, height) <= max_size:
+            return width, height
+        scale = max_size / max(width, height)
+        return max(int(round(width * scale)), 1), max(int(round(height * scale)), 1)
+
+    def _frame_pyramid(self, image, min_side) -> List[Image.Image]:
+        """The frame and its successive 2x box reductions, down to the smallest rendition."""
+        pyramid = [image]
+        while max(pyramid[-1].size) // 2 >= min_side:
+            pyramid.append(pyramid[-1].reduce(2))
+        return pyramid
+
+    def _pyramid_image(self, pyramid, size) -> Image.Image:
+        """The frame at size, resized from the smallest pyramid level that covers it."""
+        for level in reversed(pyramid):
+            if level.width >= size[0] and level.height >= size[1]:
+                break
+        if level.size == size:
+            return level.copy()
+        return level.resize(size, Image.LANCZOS)
+
+    def _create_animation_from_files(self, image_filenames, output_filename, pause_duration, bbox_aoi, font, footprints=None):
+        """Animates the mosaics in capture date order, in animation_format."""
+        rendition = {'filename': output_filename, 'format': self.animation_format,
+                     'max_size': self.max_frame_size, 'period_sec': pause_duration}
+        self._create_animations_from_files(image_filenames, [rendition], bbox_aoi, font, footprints)
+
+    def _create_animations_from_files(self, image_filenames, renditions, bbox_aoi, font, footprints=None):
+        """Animates the mosaics in capture date order into every rendition, a dict with the output
+        'filename', 'format', 'max_size' and 'period_sec'.  Each mosaic is warped once onto the frame
+        grid of the largest rendition, without intermediate files."""
         logger.info(f"Creating Animation For Filenames: {image_filenames}")
+        if not image_filenames:
+            logger.warning("No mosaics to animate.")
+            return
+
         # Sort the image filenames based on the capture date
         image_filenames.sort(key=self._extract_date)
 
-        resized_filenames = self._resize_mosaics_to_largest(image_filenames)
+        grid = self._frame_grid(image_filenames, bbox_aoi, footprints, self._renditions_max_size(renditions))
+        self._encode_renditions(self._render_frames(image_filenames, grid), grid, renditions, bbox_aoi, font)
 
-        # Create a writer object
-        duration_ms = pause_duration * 1000  # Convert seconds to milliseconds
+    def _renditions_max_size(self, renditions) -> Optional[int]:
+        """The frame size of the largest rendition, None for the mosaic resolution."""
+        max_sizes = [rendition['max_size'] for rendition in renditions]
+        return None if None in max_sizes else max(max_sizes)
 
-        # Seek the largest dimensions
-        max_width, max_height, largest_bounds = self._get_max_dimensions_and_bounds(resized_filenames)
+    def _render_frames(self, image_filenames, grid) -> Iterator[Tuple[datetime, np.ndarray]]:
+        """Yields (capture date, (height, width, 3) uint8 frame) for every mosaic, warped onto the frame grid."""
+        _, _, width, height = grid
+        with rasterio.open(image_filenames[0]) as src:
+            frame = np.zeros((3, height, width), dtype=src.dtypes[0])
 
-        writer = imageio.get_writer(output_filename, duration=duration_ms, macro_block_size=1, loop=0)
-
-        # Iterate through the image filenames and add them to the animation
-        for index, image_filename in enumerate(resized_filenames):
+        for image_filename in image_filenames:
             logger.info(f"Animating File: {image_filename}")
+            yield self._extract_date(image_filename), self._frame_to_rgb(self._warp_frame(image_filename, grid, frame))
+
+    def _encode_renditions(self, frames, grid, renditions, bbox_aoi, font):
+        """Labels the (capture date, frame) pairs and encodes them into every rendition as they come.
+        The smaller renditions are resized from a pyramid of 2x reductions built once per frame."""
+        _, _, width, height = grid
+        sizes = [self._rendition_size(width, height, rendition['max_size']) for rendition in renditions]
+        min_side = min(max(size) for size in sizes)
+
+        # Extract bounds from Polygon object
+        minx, miny, maxx, maxy = bbox_aoi.bounds
+
+        # Calculate center latitude and longitude
+        center_lat = (miny + maxy) / 2
+        center_long = (minx + maxx) / 2
+
+        # Add every frame to every rendition, frames are encoded as they are made.
+        with ExitStack() as stack:
+            encoders = [stack.enter_context(open_encoder(rendition['filename'], rendition['format'], rendition['period_sec'],
+                                                         self.animation_quality)) for rendition in renditions]
+            for capture_date, frame in frames:
+                pyramid = self._frame_pyramid(Image.fromarray(frame), min_side)
+
+                # Create the label text with Date and Lat/Long
+                date = capture_date.strftime('%Y-%m-%dT%H%M%S')
+                label_text = f"Date: {date} | Lat: {center_lat:.4f}, Long: {center_long:.4f}"
+
+                for encoder, size in zip(encoders, sizes):
+                    rendition_image = self._pyramid_image(pyramid, size)
+
+                    # Create a drawing context
+                    draw = ImageDraw.Draw(rendition_image)
+
+                    # Calculate the width of the text
+                    text_width = draw.textlength(label_text, font=font)
+
+                    # Define the position to center the text horizontally, near the top vertically
+                    position = ((size[0] - text_width) / 2, 10)
+
+                    # Draw the text on the image in yellow
+                    draw.text(position, label_text, fill="yellow", font=font)
+
+                    encoder.append(np.asarray(rendition_image))
+
+        logger.info(f"Animations saved as: {[rendition['filename'] for rendition in renditions]}.")
+
+    def _update_frame_store(self, jobs, bbox_aoi, max_size) -> Tuple[Optional[Tuple], List[str], List[str]]:
+        """Mosaics the captures of the jobs missing from the frame store of the aoi and adds their frames.
+        Returns the frame grid, None while the store has no frames, the filenames of the new mosaics and
+        the outcome_ids of the jobs to animate.  Only mosaicked captures are stored, so stored ones are
+        checked against the current thresholds and rejected ones are checked again on every update.
+        The grid is fixed by the first captures stored, a different max_size starts the store over."""
+        grid_meta = self.frame_store.load_grid(bbox_aoi)
+        if grid_meta is not None and grid_meta['max_size'] != max_size:
+            logger.info(f"Frame size changed from {grid_meta['max_size']} to {max_size}, rebuilding the frame store.")
+            self.frame_store.clear(bbox_aoi)
+            grid_meta = None
+
+        known = set(self.frame_store.outcome_ids(bbox_aoi)) if grid_meta is not None else set()
+        stored_jobs = [job for job in jobs if job['outcome_id'] in known]
+        new_jobs = [job for job in jobs if job['outcome_id'] not in known]
+        frame_ids = [job['outcome_id'] for job in stored_jobs if self._is_group_valid(job['tiles'], job['max_tile_count'])]
+        logger.warning(f"Frame store has {len(stored_jobs)} of {len(jobs)} captures, mosaicking {len(new_jobs)}.")
+
+        # The new captures are checked by _process_group, the rejected ones give no mosaic.
+        results = self._run_mosaic_jobs(new_jobs)
+        mosaicked = [(job, fname) for job, fname in zip(new_jobs, results) if fname]
+        fnames = [fname for _, fname in mosaicked]
+        if grid_meta is not None:
+            grid = self._grid_from_meta(grid_meta)
+        elif mosaicked:
+            footprints = [geometry for job, _ in mosaicked for geometry in job['tiles'].geometry]
+            grid = self._frame_grid(fnames, bbox_aoi, footprints, max_size)
+            self.frame_store.store_grid(bbox_aoi, self._grid_to_meta(grid, max_size))
+        else:
+            return None, fnames, frame_ids
 
-            # Load the image using PIL
-            image = Image.open(image_filename)
-            resized_image = image.resize((max_width, max_height), Image.LANCZOS)
-            # Now we use the largest dimensions for our blank canvas
-            blank_image = Image.new('RGBA', (max_width, max_height), 'black')
-
-            # blank_image.paste(resized_image.convert("RGBA"), offset)
-            blank_image.paste(resized_image.convert("RGBA"), (0,0))
-
-            # Create a drawing context
-            draw = ImageDraw.Draw(blank_image)
-
-            # Extract the date from the filename and format it
-            date = self._extract_date(image_filename).strftime('%Y-%m-%dT%H%M%S')
-
-            # Extract bounds from Polygon object
-            minx, miny, maxx, maxy = bbox_aoi.bounds
-
-            # Calculate center latitude and longitude
-            center_lat = (miny + maxy) / 2
-            center_long = (minx + maxx) / 2
-
-            # Create the label text with Date and Lat/Long
-            label_text = f"Date: {date} | Lat: {center_lat:.4f}, Long: {center_long:.4f}"
-
-            # Calculate the width of the text
-            text_width = draw.textlength(label_text, font=font)
-
-            # Define the position to center the text horizontally, near the top vertically
-            position = ((max_width - text_width) / 2, 10)
-
-            # Draw the text on the image in yellow
-            draw.text(position, label_text, fill="yellow", font=font)
-
-            # Convert blank_image to a numpy array
-            image_np = np.array(blank_image)
+        for (job, _), (_, frame) in zip(mosaicked, self._render_frames(fnames, grid)):
+            self.frame_store.add_frame(bbox_aoi, job['outcome_id'], job['capture_date'], frame)
+            frame_ids.append(job['outcome_id'])
+        return grid, fnames, frame_ids
 
-            writer.append_data(image_np)
+    def _grid_to_meta(self, grid, max_size) -> Dict:
+        crs, transform, width, height = grid
+        return {'crs': crs.to_wkt(), 'transform': list(transform)[:6], 'width': width, 'height': height, 'max_size': max_size}
 
-        # Close the writer to finalize the animation
-        writer.close()
-        logger.info(f"Animation saved as: {output_filename}.")
+    def _grid_from_meta(self, grid_meta) -> Tuple:
+        return CRS.from_wkt(grid_meta['crs']), Affine(*grid_meta['transform']), grid_meta['width'], grid_meta['height']
 
     def _extract_date(self, filename):
         # Split the filename into its constituent parts
@@ -1124,3 +1611,25 @@ class TileManager:
 
         return datetime_str
 
+# The TileManager of a mosaic worker process and the settings it was built from.
+_mosaic_worker = None
+
+def _init_mosaic_worker(settings):
+    """Process pool initializer, builds the TileManager shared by the jobs of the worker."""
+    global _mosaic_worker
+    tile_manager = TileManager()
+    tile_manager.cloud_threshold = settings['cloud_threshold']
+    tile_manager.min_product_version = settings['min_product_version']
+    tile_manager.min_tile_coverage_percent = settings['min_tile_coverage_percent']
+    tile_manager.mosaic_resolution = settings['mosaic_resolution']
+    tile_manager.mosaic_block_mb = settings['mosaic_block_mb']
+    tile_manager.asset_cache = AssetCache(cache_dir=settings['asset_cache_dir'], max_size_mb=settings['asset_cache_max_size_mb'],
+                                          downloader=tile_manager.downloader)
+    _mosaic_worker = (settings, tile_manager)
+
+def _run_mosaic_job(settings, job):
+    """Process pool entry point, mosaics a job with the worker's TileManager.  Workers of an executor
+    supplied by the caller have no initializer, they build theirs on their first job."""
+    if _mosaic_worker is None or _mosaic_worker[0] != settings:
+        _init_mosaic_worker(settings)
+    return _mosaic_worker[1]._process_group(job)
@@ -0,0 +1,33 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# ArchiveConnection against the local stub STAC server.
+
+import threading
+
+from spotlite.archive import ArchiveConnection
+from benchmarks.stub_stac_server import StubStacServer, make_items
+
+
+def get_collections_within(archive, timeout_sec=10):
+    """Calls get_collections on a daemon thread, so a deadlock fails the test instead of hanging it."""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(archive.get_collections()), daemon=True)
+    thread.start()
+    thread.join(timeout_sec)
+    assert not thread.is_alive(), "get_collections did not return"
+    return results[0]
+
+
+def test_get_collections_opens_a_new_connection():
+    with StubStacServer(make_items(10)) as server:
+        archive = ArchiveConnection(server.url)
+        assert get_collections_within(archive) == []
+
+        # Closing drops the client, the next call opens it again.
+        archive.close()
+        assert get_collections_within(archive) == []
@@ -0,0 +1,73 @@
+# Copyright (c) 2024 Satellogic USA Inc. All Rights Reserved.
+#
+# This file is part of Spotlite.
+#
+# This file is subject to the terms and conditions defined in the file 'LICENSE',
+# which is part of this source code package.
+#
+# Searcher.search_archive_async against search_archive on the local stub STAC server.
+
+import asyncio
+import pytest
+from shapely.geometry import box
+
+from spotlite.search import Searcher
+from benchmarks.stub_stac_server import StubStacServer, make_items
+
+AOI = box(-58.6, -34.7, -58.2, -34.3)
+
+
+def make_searcher(url, adaptive_chunking=True):
+    searcher = Searcher()
+    searcher.stac_api_url = url
+    searcher.use_search_cache = False
+    searcher.adaptive_chunking = adaptive_chunking
+    searcher.target_items_per_chunk = 40
+    searcher.search_page_size = 20
+    searcher.archive.scheduler.base_delay_sec = 0.01
+    return searcher
+
+
+def search_both(server, start_date="2022-01-01", end_date="2022-12-31", adaptive_chunking=True):
+    threaded_gdf = make_searcher(server.url, adaptive_chunking).search_archive(AOI, start_date, end_date)
+    threaded_requests = server.num_requests
+    async_gdf = asyncio.run(make_searcher(server.url, adaptive_chunking).search_archive_async(AOI, start_date, end_date))
+    return threaded_gdf, async_gdf, threaded_requests, server.num_requests - threaded_requests
+
+
+@pytest.mark.parametrize("adaptive_chunking", [True, False])
+def test_async_search_matches_threaded_search(adaptive_chunking):
+    with StubStacServer(make_items(1500)) as server:
+        threaded_gdf, async_gdf, threaded_requests, async_requests = search_both(server, adaptive_chunking=adaptive_chunking)
+
+    assert len(threaded_gdf) > 0
+    assert sorted(async_gdf['id']) == sorted(threaded_gdf['id'])
+    if not adaptive_chunking:
+        # Adaptive chunks follow the order searches finish in, fixed ones take one request per page.
+        assert async_requests == threaded_requests
+
+
+def test_adaptive_chunking_merges_sparse_windows():
+    with StubStacServer(make_items(60)) as server:
+        threaded_gdf, async_gdf, threaded_requests, async_requests = search_both(server, "2020-01-01", "2023-12-31")
+        _, _, fixed_requests, _ = search_both(server, "2020-01-01", "2023-12-31", adaptive_chunking=False)
+
+    assert len(threaded_gdf) > 0
+    assert sorted(async_gdf['id']) == sorted(threaded_gdf['id'])
+    assert threaded_requests < fixed_requests
+    assert async_requests < fixed_requests
+
+
+def test_async_search_retries_throttled_pages():
+    with StubStacServer(make_items(600), throttle_every=5) as server:
+        threaded_gdf, async_gdf, _, _ = search_both(server)
+        assert server.num_throttled > 0
+
+    assert sorted(async_gdf['id']) == sorted(threaded_gdf['id'])
+
+
+def test_async_search_without_results():
+    with StubStacServer(make_items(100)) as server:
+        async_gdf = asyncio.run(make_searcher(server.url).search_archive_async(AOI, "2030-01-01", "2030-03-01"))
+
+    assert async_gdf.empty